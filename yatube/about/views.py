@@ -1,9 +1,14 @@
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView
 
+from core.caching import cache_policy
 
+
+@method_decorator(cache_policy(shared=True), name='dispatch')
 class AboutAuthorView(TemplateView):
     template_name = 'about/author.html'
 
 
+@method_decorator(cache_policy(shared=True), name='dispatch')
 class AboutTechView(TemplateView):
     template_name = 'about/tech.html'
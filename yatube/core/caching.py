@@ -0,0 +1,48 @@
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+
+def public(response):
+    patch_cache_control(
+        response, public=True, max_age=settings.PAGE_MAX_AGE,
+        s_maxage=settings.PAGE_SHARED_MAX_AGE)
+
+
+def private(response):
+    patch_cache_control(response, private=True, max_age=0)
+
+
+def cache_policy(shared=False):
+    """Заголовки Cache-Control для страницы.
+
+    Анонимам страница отдаётся как public: её хранят и общий кэш
+    (s-maxage), и браузер (max-age). Залогиненным — private, а
+    Vary: Cookie не даёт общему кэшу отдать чужую версию.
+    shared=True — страница не зависит от пользователя (его части
+    подгружаются отдельными фрагментами), общий кэш отдаёт её всем.
+    Ответы с cookie и с ошибками не кэшируются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if (response.status_code != 200
+                    or response.has_header('Cache-Control')):
+                return response
+            if response.cookies:
+                private(response)
+            elif shared:
+                public(response)
+                if settings.FRAGMENTS_MODE == 'esi':
+                    response['Surrogate-Control'] = 'content="ESI/1.0"'
+            else:
+                patch_vary_headers(response, ('Cookie',))
+                if request.user.is_authenticated:
+                    private(response)
+                else:
+                    public(response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,36 @@
+import inspect
+
+from django.http import Http404
+from django.shortcuts import render
+
+FRAGMENTS = {}
+
+
+def fragment(name):
+    """Регистрирует персональную часть страницы.
+
+    В кэшируемом каркасе страницы на её месте стоит заглушка (тег
+    {% fragment %}), сам фрагмент отдаётся отдельным запросом
+    /fragments/<name>/ с параметрами тега.
+    """
+    def decorator(func):
+        FRAGMENTS[name] = func
+        return func
+    return decorator
+
+
+def render_fragment(request, name):
+    func = FRAGMENTS.get(name)
+    if func is None:
+        raise Http404
+    try:
+        arguments = inspect.signature(func).bind(
+            request, **request.GET.dict())
+    except TypeError:
+        raise Http404
+    return func(*arguments.args, **arguments.kwargs)
+
+
+@fragment('user_menu')
+def user_menu(request):
+    return render(request, 'includes/user_menu.html')
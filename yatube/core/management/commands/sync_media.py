@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from core.storage import ObjectStorage
+
+
+class Command(BaseCommand):
+    help = 'Переносит файлы из MEDIA_ROOT в объектное хранилище.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=settings.MEDIA_ROOT)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        source = FileSystemStorage(location=options['source'])
+        target = ObjectStorage()
+        names = [
+            os.path.relpath(os.path.join(root, filename), source.location)
+            .replace(os.sep, '/')
+            for root, _, files in os.walk(source.location)
+            for filename in files
+        ]
+
+        def sync(name):
+            head = target.client.head_object(name)
+            if head is not None and head['size'] == source.size(name):
+                return False
+            if not options['dry_run']:
+                with source.open(name) as f:
+                    target._save(name, File(f, name=name))
+            return True
+
+        with ThreadPoolExecutor(options['workers']) as executor:
+            copied = sum(executor.map(sync, names))
+        self.stdout.write(f'Скопировано: {copied}, всего: {len(names)}')
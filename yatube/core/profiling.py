@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.template import engines
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_original_render = Template._render
+
+
+def precompile_templates():
+    """Загружает все шаблоны проекта в кэширующий загрузчик."""
+    engine = engines['django'].engine
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.endswith('.html'):
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), directory)
+                engine.get_template(name.replace(os.sep, '/'))
+
+
+def _profiled_render(self, context):
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        return _original_render(self, context)
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        entry = stats[self.origin.template_name or self.name]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+
+
+def install():
+    """Оборачивает Template._render замером времени."""
+    global _original_render
+    if Template._render is not _profiled_render:
+        _original_render = Template._render
+        Template._render = _profiled_render
+
+
+class TemplateProfile:
+    """Собирает число вызовов и время рендеринга каждого шаблона."""
+
+    def __enter__(self):
+        install()
+        self.stats = defaultdict(lambda: [0, 0.0])
+        _local.stats = self.stats
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.stats = None
+
+    def server_timing(self):
+        return ', '.join(
+            f'tpl;desc="{name} x{count}";dur={total * 1000:.2f}'
+            for name, (count, total) in self.stats.items()
+        )
+
+
+class TemplateProfilerMiddleware:
+    """Пишет в лог и в Server-Timing время рендеринга шаблонов запроса.
+
+    Время включающее: у index.html в него входят все post_card.html.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        with TemplateProfile() as profile:
+            response = self.get_response(request)
+        for name, (count, total) in profile.stats.items():
+            logger.info(
+                '%s %s: %d x, %.2f ms', request.path, name, count,
+                total * 1000,
+            )
+        if profile.stats:
+            response['Server-Timing'] = profile.server_timing()
+        return response
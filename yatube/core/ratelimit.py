@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.signed_cookies import (
+    SessionStore as SignedCookieStore,
+)
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+class CacheCounterStore:
+    """Счётчики ограничений в кэше RATELIMIT_CACHE, без обращений к базе."""
+
+    def __init__(self):
+        self.cache = caches[settings.RATELIMIT_CACHE]
+
+    def incr(self, key, timeout):
+        if self.cache.add(key, 1, timeout):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, timeout)
+            return 1
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+
+def sliding_window(store, key, limit, period, now):
+    """Скользящее окно из двух соседних фиксированных окон.
+
+    Запросы прошлого окна учитываются с весом оставшейся его доли.
+    """
+    window = int(now // period)
+    elapsed = (now % period) / period
+    current = store.incr(f'{key}:{window}', period * 2)
+    previous = store.get(f'{key}:{window - 1}', 0)
+    return previous * (1 - elapsed) + current <= limit
+
+
+def token_bucket(store, key, limit, period, now):
+    """Корзина на limit жетонов, пополняется limit жетонами за period.
+
+    Чтение и запись не атомарны: при гонке возможен лишний запрос.
+    """
+    tokens, updated = store.get(key, (limit, now))
+    tokens = min(limit, tokens + (now - updated) * limit / period)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    store.set(key, (tokens, now), period)
+    return allowed
+
+
+ALGORITHMS = {
+    'sliding': sliding_window,
+    'bucket': token_bucket,
+}
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request, key):
+    """Ключ счётчика без запросов к базе.
+
+    Подписанная cookie-сессия читается сразу и даёт id пользователя.
+    Сессию в базе не загружаем: ключом служит хеш её cookie.
+    """
+    session = getattr(request, 'session', None)
+    if key == 'user' and session is not None:
+        if isinstance(session, SignedCookieStore):
+            user_id = session.get(SESSION_KEY)
+            if user_id is not None:
+                return f'user:{user_id}'
+        elif session.session_key:
+            digest = hashlib.sha256(session.session_key.encode()).hexdigest()
+            return f'session:{digest}'
+    return f'ip:{client_ip(request)}'
+
+
+def throttled_count(group):
+    return caches[settings.RATELIMIT_CACHE].get(
+        f'ratelimit:throttled:{group}', 0)
+
+
+def ratelimit(group, key='user', methods=('POST',), algorithm='sliding'):
+    """Ограничивает частоту запросов к представлению.
+
+    Лимит берётся из settings.RATELIMITS[group], например '10/m'.
+    key='user' считает запросы по пользователю или его сессии (без
+    сессии - по IP), key='ip' - по IP. Сверх лимита возвращается 429.
+    """
+    check = ALGORITHMS[algorithm]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED and request.method in methods:
+                limit, period = parse_rate(settings.RATELIMITS[group])
+                store = import_string(settings.RATELIMIT_STORE)()
+                counter = f'ratelimit:{group}:{client_key(request, key)}'
+                if not check(store, counter, limit, period, time.time()):
+                    store.incr(f'ratelimit:throttled:{group}', None)
+                    logger.warning('Rate limit %s for %s', group, counter)
+                    response = HttpResponse(
+                        'Слишком много запросов', status=429)
+                    response['Retry-After'] = period
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
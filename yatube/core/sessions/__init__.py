@@ -0,0 +1,21 @@
+class CoalescingSessionMixin:
+    """Не записывает сессию, если её данные не изменились с загрузки.
+
+    Django сохраняет сессию при любом присваивании, даже того же значения;
+    здесь сравниваются сериализованные данные до и после запроса.
+    """
+
+    _loaded = None
+
+    def load(self):
+        data = super().load()
+        self._loaded = self.serializer().dumps(data)
+        return data
+
+    def save(self, must_create=False):
+        data = self.serializer().dumps(
+            self._get_session(no_load=must_create))
+        if not must_create and data == self._loaded:
+            return
+        super().save(must_create=must_create)
+        self._loaded = data
@@ -0,0 +1,9 @@
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as BaseStore,
+)
+
+from . import CoalescingSessionMixin
+
+
+class SessionStore(CoalescingSessionMixin, BaseStore):
+    pass
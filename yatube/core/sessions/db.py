@@ -0,0 +1,9 @@
+from django.contrib.sessions.backends.db import (
+    SessionStore as BaseStore,
+)
+
+from . import CoalescingSessionMixin
+
+
+class SessionStore(CoalescingSessionMixin, BaseStore):
+    pass
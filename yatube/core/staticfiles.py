@@ -0,0 +1,141 @@
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage)
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.ico', '.json')
+
+# Файлы с хэшем в имени не меняются, их можно кэшировать на год.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MAX_AGE = 60
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшами в именах и заранее сжатыми копиями .gz и .br."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in names:
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+
+
+def parse_accept_encoding(header):
+    """Accept-Encoding -> {кодировка: q}; без q вес равен 1."""
+    qualities = {}
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        max_age = IMMUTABLE_MAX_AGE if immutable else MAX_AGE
+        self.cache_control = f'public, max-age={max_age}'
+        if immutable:
+            self.cache_control += ', immutable'
+        self.variants = {
+            encoding: (path + suffix, os.path.getsize(path + suffix))
+            for encoding, suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        }
+
+    def select(self, accept_encoding):
+        qualities = parse_accept_encoding(accept_encoding)
+        for encoding, variant in self.variants.items():
+            if qualities.get(encoding, qualities.get('*', 0)) > 0:
+                return encoding, variant
+        return None, (self.path, self.size)
+
+
+class StaticFilesMiddleware:
+    """Раздаёт собранную collectstatic статику без отдельного веб-сервера.
+
+    Список файлов читается из STATIC_ROOT один раз при старте процесса.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.files = self.scan(settings.STATIC_ROOT, settings.STATIC_URL)
+
+    @staticmethod
+    def scan(root, url):
+        hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[url + name] = StaticFile(path, name in hashed)
+        return files
+
+    def __call__(self, request):
+        static_file = self.files.get(request.path_info)
+        if static_file is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        return self.serve(request, static_file)
+
+    def serve(self, request, static_file):
+        since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if since is not None and since >= static_file.mtime:
+            response = HttpResponseNotModified()
+        else:
+            encoding, (path, size) = static_file.select(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            response = FileResponse(
+                open(path, 'rb'), content_type=static_file.content_type)
+            response['Content-Length'] = size
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(static_file.mtime)
+        response['Cache-Control'] = static_file.cache_control
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
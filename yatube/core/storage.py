@@ -0,0 +1,272 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+from django.utils._os import safe_join
+
+# Сколько подписанных ссылок Boto3ObjectStore помнит в пределах окна.
+SIGNED_URLS_CACHE_SIZE = 10000
+
+
+class LocalObjectStore:
+    """S3-совместимое хранилище объектов поверх файловой системы.
+
+    Повторяет операции S3, которыми пользуется ObjectStorage, и нужно
+    для разработки и тестов без настоящего объектного хранилища.
+    """
+
+    def __init__(self, root, bucket, base_url=None):
+        self.location = os.path.join(root, bucket)
+        self.uploads = os.path.join(root, '.uploads')
+        self.base_url = base_url or settings.MEDIA_URL
+
+    def path(self, key):
+        return safe_join(self.location, key)
+
+    def put_object(self, key, body):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def get_object(self, key):
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def head_object(self, key):
+        try:
+            stat = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return {
+            'size': stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        }
+
+    def delete_object(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list_objects(self, prefix):
+        directory = self.path(prefix)
+        dirs, files = [], []
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                (dirs if entry.is_dir() else files).append(entry.name)
+        return dirs, files
+
+    def create_multipart_upload(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.uploads, upload_id))
+        return upload_id
+
+    def upload_part(self, key, upload_id, number, body):
+        with open(os.path.join(self.uploads, upload_id, str(number)),
+                  'wb') as f:
+            f.write(body)
+        return {'PartNumber': number, 'ETag': hashlib.md5(body).hexdigest()}
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{upload_id}.tmp'
+        with open(tmp_path, 'wb') as target:
+            for part in sorted(parts, key=lambda p: p['PartNumber']):
+                part_path = os.path.join(
+                    self.uploads, upload_id, str(part['PartNumber']))
+                with open(part_path, 'rb') as source:
+                    shutil.copyfileobj(source, target)
+        os.replace(tmp_path, path)
+        self.abort_multipart_upload(key, upload_id)
+
+    def abort_multipart_upload(self, key, upload_id):
+        shutil.rmtree(os.path.join(self.uploads, upload_id),
+                      ignore_errors=True)
+
+    def signature(self, key, expires):
+        return salted_hmac(
+            'core.storage.LocalObjectStore', f'{key}:{expires}'
+        ).hexdigest()
+
+    def signed_url(self, key, expires_in):
+        # Срок округляется до конца следующего окна expires_in: в пределах
+        # окна ссылка одна и та же и кэшируется браузером и страницами.
+        expires = (int(time.time()) // expires_in + 2) * expires_in
+        query = urlencode({
+            'expires': expires,
+            'signature': self.signature(key, expires),
+        })
+        return f'{self.base_url}{quote(key)}?{query}'
+
+    def verify(self, key, expires, signature):
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        return expires >= time.time() and constant_time_compare(
+            signature, self.signature(key, expires))
+
+
+class Boto3ObjectStore:
+    """Настоящее S3-совместимое хранилище через boto3."""
+
+    def __init__(self, bucket, **client_options):
+        import boto3
+        self.bucket = bucket
+        self.client = boto3.client('s3', **client_options)
+        self._signed_window = None
+        self._signed = {}
+
+    def put_object(self, key, body):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=body)
+
+    def get_object(self, key):
+        return self.client.get_object(
+            Bucket=self.bucket, Key=key)['Body'].read()
+
+    def head_object(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError:
+            return None
+        return {'size': head['ContentLength'],
+                'modified': head['LastModified']}
+
+    def delete_object(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list_objects(self, prefix):
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        dirs, files = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(
+                Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            dirs += [p['Prefix'][len(prefix):].rstrip('/')
+                     for p in page.get('CommonPrefixes', ())]
+            files += [o['Key'][len(prefix):] for o in page.get('Contents', ())]
+        return dirs, files
+
+    def create_multipart_upload(self, key):
+        return self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=key)['UploadId']
+
+    def upload_part(self, key, upload_id, number, body):
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            PartNumber=number, Body=body)
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={
+                'Parts': sorted(parts, key=lambda p: p['PartNumber'])})
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def signed_url(self, key, expires_in):
+        # В подпись S3 входит время её создания, поэтому ссылка запоминается
+        # на окно expires_in и подписывается на два окна вперёд.
+        window = int(time.time()) // expires_in
+        if window != self._signed_window or len(
+                self._signed) >= SIGNED_URLS_CACHE_SIZE:
+            self._signed_window, self._signed = window, {}
+        url = self._signed.get(key)
+        if url is None:
+            url = self._signed[key] = self.client.generate_presigned_url(
+                'get_object', Params={'Bucket': self.bucket, 'Key': key},
+                ExpiresIn=2 * expires_in)
+        return url
+
+
+@deconstructible
+class ObjectStorage(Storage):
+    """Хранилище медиа в объектном хранилище из settings.OBJECT_STORAGE.
+
+    Большие файлы загружаются по частям параллельно, ссылки на файлы
+    подписаны и действуют URL_EXPIRES секунд.
+    """
+
+    def __init__(self, client=None, **options):
+        self.options = {**settings.OBJECT_STORAGE, **options}
+        if client is None:
+            client = import_string(self.options['CLIENT'])(
+                **self.options['OPTIONS'])
+        self.client = client
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.client.get_object(name), name=name)
+
+    def _save(self, name, content):
+        name = name.replace('\\', '/')
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        if content.size > self.options['MULTIPART_THRESHOLD']:
+            self._multipart_upload(name, content)
+        else:
+            self.client.put_object(name, content.read())
+        return name
+
+    def _multipart_upload(self, name, content):
+        workers = self.options['WORKERS']
+        # Не держим в памяти больше частей, чем успевают загружать потоки.
+        slots = threading.BoundedSemaphore(workers * 2)
+        upload_id = self.client.create_multipart_upload(name)
+
+        def upload(number, chunk):
+            try:
+                return self.client.upload_part(name, upload_id, number, chunk)
+            finally:
+                slots.release()
+
+        try:
+            with ThreadPoolExecutor(workers) as executor:
+                futures = []
+                chunks = content.chunks(self.options['PART_SIZE'])
+                for number, chunk in enumerate(chunks, 1):
+                    slots.acquire()
+                    futures.append(executor.submit(upload, number, chunk))
+                parts = [future.result() for future in futures]
+            self.client.complete_multipart_upload(name, upload_id, parts)
+        except Exception:
+            self.client.abort_multipart_upload(name, upload_id)
+            raise
+
+    def delete(self, name):
+        self.client.delete_object(name)
+
+    def exists(self, name):
+        return self.client.head_object(name) is not None
+
+    def listdir(self, path):
+        return self.client.list_objects(path)
+
+    def size(self, name):
+        return self.client.head_object(name)['size']
+
+    def get_modified_time(self, name):
+        return self.client.head_object(name)['modified']
+
+    def url(self, name):
+        return self.client.signed_url(name, self.options['URL_EXPIRES'])
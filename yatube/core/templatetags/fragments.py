@@ -0,0 +1,29 @@
+from urllib.parse import urlencode
+
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def fragment(name, noscript=None, **params):
+    """Заглушка на месте персональной части страницы.
+
+    В режиме esi её заполняет прокси, иначе — скрипт в base.html; шаблон
+    noscript показывается вместо неё браузерам без JavaScript.
+    """
+    url = reverse('fragment', args=(name,))
+    if params:
+        url += '?' + urlencode(params)
+    if settings.FRAGMENTS_MODE == 'esi':
+        return format_html('<esi:include src="{}"/>', url)
+    placeholder = format_html(
+        '<template data-fragment="{}"></template>', url)
+    if noscript is None:
+        return placeholder
+    return format_html(
+        '{}<noscript>{}</noscript>', placeholder, render_to_string(noscript))
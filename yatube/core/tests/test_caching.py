@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class CachePolicyTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_pages_are_shared(self):
+        """Каркас страниц одинаков для всех и не зависит от cookie."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for client in (self.client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertIn('public', response['Cache-Control'])
+                    self.assertIn('s-maxage', response['Cache-Control'])
+                    self.assertFalse(response.has_header('Vary'))
+                    self.assertNotContains(response, 'Выйти')
+                    self.assertNotContains(response, 'редактировать')
+
+    def test_user_menu_has_noscript_login(self):
+        """Без JavaScript вместо меню пользователя есть ссылка на вход."""
+        login = reverse('users:login')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<noscript>')
+        self.assertContains(response, login)
+        with override_settings(FRAGMENTS_MODE='esi'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, '<noscript>')
+
+    def test_personal_pages_are_private(self):
+        for url in (reverse('posts:follow_index'),
+                    reverse('posts:post_create')):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+
+    def test_anonymous_fragments_are_public(self):
+        response = self.client.get(
+            reverse('fragment', args=('comment_form',))
+            + f'?post_id={self.post.pk}')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertNotContains(response, '<form')
+
+    def test_post_actions_fragment(self):
+        url = reverse('fragment', args=('post_actions',)) + (
+            f'?post_id={self.post.pk}&author_id={self.user.pk}')
+        self.assertContains(self.authorized_client.get(url), 'редактировать')
+        self.assertNotContains(self.client.get(url), 'редактировать')
+
+    def test_feed_tabs_accepts_only_known_feeds(self):
+        url = reverse('fragment', args=('feed_tabs',))
+        response = self.authorized_client.get(url + '?active=trending')
+        self.assertEqual(response.context['active'], 'trending')
+        self.assertContains(response, 'nav-link active')
+        response = self.authorized_client.get(url + '?active=user')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_unknown_fragment_or_arguments(self):
+        for url in (reverse('fragment', args=('missing',)),
+                    reverse('fragment', args=('post_actions',))):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_user_menu_fragment(self):
+        url = reverse('fragment', args=('user_menu',))
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertContains(response, 'Выйти')
+        self.assertContains(self.client.get(url), 'Войти')
@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.ratelimit import (
+    CacheCounterStore, ratelimit, throttled_count, token_bucket)
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(RATELIMITS={'add_comment': '2/m', 'test': '1/m'})
+class RateLimitTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_comments_throttled_per_user(self):
+        """Сверх лимита комментарий не создаётся, ответ 429."""
+        url = reverse('posts:add_comment', args=(self.post.pk,))
+        for _ in range(2):
+            self.authorized_client.post(url, {'text': 'Комментарий'})
+        response = self.authorized_client.post(url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(throttled_count('add_comment'), 1)
+
+    def test_throttled_request_skips_database(self):
+        """Отказ по лимиту не обращается к базе, даже к сессии."""
+        url = reverse('posts:add_comment', args=(self.post.pk,))
+        for _ in range(2):
+            self.authorized_client.post(url, {'text': 'Комментарий'})
+        with self.assertNumQueries(0):
+            response = self.authorized_client.post(url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+    @override_settings(SESSION_ENGINE='core.sessions.signed_cookies')
+    def test_signed_cookie_session_throttled_per_user(self):
+        """Из подписанной cookie-сессии ключом берётся пользователь."""
+        view = ratelimit('test')(lambda request: HttpResponse())
+        for _ in range(2):
+            client = Client()
+            client.force_login(self.user)
+            request = RequestFactory().post('/')
+            request.session = client.session
+            response = view(request)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+    def test_token_bucket_refills(self):
+        """Корзина пополняется со временем."""
+        store = CacheCounterStore()
+        results = [
+            token_bucket(store, 'bucket', 2, 60, now)
+            for now in (0, 0, 0, 30)
+        ]
+        self.assertEqual(results, [True, True, False, True])
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.sessions.db import SessionStore
+
+User = get_user_model()
+
+
+class SessionTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_session_not_saved(self):
+        """Присваивание того же значения не пишет сессию в базу."""
+        session = SessionStore()
+        session['key'] = 'value'
+        session.save()
+        session = SessionStore(session.session_key)
+        session['key'] = 'value'
+        self.assertTrue(session.modified)
+        with self.assertNumQueries(0):
+            session.save()
+        session['key'] = 'other'
+        session.save()
+        self.assertEqual(
+            SessionStore(session.session_key)['key'], 'other')
+
+    def follow_index_queries(self):
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:follow_index'))
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('posts:follow_index'))
+        return len(queries)
+
+    def test_session_modes_query_savings(self):
+        """cached_db и signed_cookies не читают сессию из базы."""
+        db_queries = self.follow_index_queries()
+        for engine in ('cached_db', 'signed_cookies'):
+            with self.subTest(engine=engine), override_settings(
+                    SESSION_ENGINE=f'core.sessions.{engine}'):
+                self.assertEqual(
+                    self.follow_index_queries(), db_queries - 1)
+
+    def test_clear_expired_sessions_in_batches(self):
+        """Команда удаляет только просроченные сессии."""
+        expired = timezone.now() - timedelta(days=1)
+        for number in range(5):
+            Session.objects.create(
+                session_key=f'expired{number}', session_data='',
+                expire_date=expired)
+        alive = Session.objects.create(
+            session_key='alive', session_data='',
+            expire_date=timezone.now() + timedelta(days=1))
+        call_command(
+            'clear_expired_sessions', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(Session.objects.all()), [alive])
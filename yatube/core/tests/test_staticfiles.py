@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+
+from http import HTTPStatus
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.staticfiles import (
+    IMMUTABLE_MAX_AGE, StaticFilesMiddleware, parse_accept_encoding)
+
+STATIC_DIR = tempfile.mkdtemp()
+STATIC_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    STATICFILES_DIRS=(STATIC_DIR,),
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE=(
+        'core.staticfiles.CompressedManifestStaticFilesStorage'),
+)
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(STATIC_DIR, 'css'), exist_ok=True)
+        with open(os.path.join(STATIC_DIR, 'css', 'site.css'), 'w') as f:
+            f.write('body { margin: 0; }\n' * 50)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_DIR, ignore_errors=True)
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.middleware = StaticFilesMiddleware(lambda r: HttpResponse())
+        self.hashed_url = next(
+            url for url in self.middleware.files
+            if url.startswith('/static/css/site.')
+            and url != '/static/css/site.css'
+        )
+
+    def test_collectstatic_builds_compressed_variants(self):
+        """collectstatic кладёт рядом с файлом сжатую копию."""
+        self.assertTrue(os.path.exists(
+            os.path.join(STATIC_ROOT, self.hashed_url[len('/static/'):])
+            + '.gz'))
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        """Файл с хэшем отдаётся сжатым и с долгим кэшем."""
+        request = RequestFactory().get(
+            self.hashed_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn(
+            f'max-age={IMMUTABLE_MAX_AGE}', response['Cache-Control'])
+        response.close()
+
+    def test_refused_encoding_not_served(self):
+        """Кодировка с q=0 не отдаётся, даже если названа в заголовке."""
+        for header in ('gzip;q=0', 'br, gzip; q=0, identity', 'x-gzip'):
+            with self.subTest(header=header):
+                request = RequestFactory().get(
+                    self.hashed_url, HTTP_ACCEPT_ENCODING=header)
+                response = self.middleware(request)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                response.close()
+        self.assertEqual(
+            parse_accept_encoding('br;q=0, GZIP;q=0.5, *'),
+            {'br': 0.0, 'gzip': 0.5, '*': 1.0})
+
+    def test_not_modified(self):
+        """Повторный запрос с If-Modified-Since получает 304."""
+        request = RequestFactory().get('/static/css/site.css')
+        response = self.middleware(request)
+        response.close()
+        request = RequestFactory().get(
+            '/static/css/site.css',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertNotIn('immutable', response['Cache-Control'])
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.storage import ObjectStorage
+from core.views import object_media
+
+STORE_ROOT = tempfile.mkdtemp()
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    OBJECT_STORAGE={
+        'CLIENT': 'core.storage.LocalObjectStore',
+        'OPTIONS': {'root': STORE_ROOT, 'bucket': 'test'},
+        'MULTIPART_THRESHOLD': 10,
+        'PART_SIZE': 4,
+        'WORKERS': 2,
+        'URL_EXPIRES': 60,
+    },
+)
+class ObjectStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STORE_ROOT, ignore_errors=True)
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = ObjectStorage()
+
+    def test_multipart_upload_assembles_parts(self):
+        """Большой файл загружается частями и собирается по порядку."""
+        content = b'0123456789abcdefghij-tail'
+        name = self.storage.save('posts/big.bin', ContentFile(content))
+        self.assertEqual(self.storage.open(name).read(), content)
+        self.assertEqual(self.storage.size(name), len(content))
+        self.assertEqual(os.listdir(os.path.join(STORE_ROOT, '.uploads')), [])
+
+    def test_signed_url_is_served_and_checked(self):
+        """Файл отдаётся только по ссылке с верной подписью."""
+        name = self.storage.save('posts/small.txt', ContentFile(b'hello'))
+        query = parse_qs(urlsplit(self.storage.url(name)).query)
+        expires, signature = query['expires'][0], query['signature'][0]
+        client = self.storage.client
+        self.assertTrue(client.verify(name, expires, signature))
+        self.assertFalse(client.verify(name, expires, 'forged'))
+        self.assertFalse(client.verify(name, '0', signature))
+
+    def test_signed_url_is_stable_within_window(self):
+        """Ссылка не меняется от рендера к рендеру в пределах окна."""
+        name = self.storage.save('posts/stable.txt', ContentFile(b'hello'))
+        with mock.patch('core.storage.time.time', return_value=120.0):
+            url = self.storage.url(name)
+        with mock.patch('core.storage.time.time', return_value=179.0):
+            self.assertEqual(self.storage.url(name), url)
+        expires = int(parse_qs(urlsplit(url).query)['expires'][0])
+        self.assertEqual(expires, 240)
+
+    def test_object_media_view(self):
+        """Представление отдаёт файл по подписи и 404 без неё."""
+        name = self.storage.save('posts/view.txt', ContentFile(b'data'))
+        url = urlsplit(self.storage.url(name))
+        with override_settings(DEFAULT_FILE_STORAGE=(
+                'core.storage.ObjectStorage')):
+            request = RequestFactory().get(url.path + '?' + url.query)
+            response = object_media(request, name)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(b''.join(response.streaming_content), b'data')
+            response.close()
+            request = RequestFactory().get(url.path)
+            with self.assertRaises(Http404):
+                object_media(request, name)
+
+    def test_sync_media_copies_missing_files(self):
+        """sync_media переносит файлы из MEDIA_ROOT один раз."""
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'old.gif'), 'wb') as f:
+            f.write(b'GIF89a')
+        call_command('sync_media', stdout=StringIO())
+        self.assertTrue(self.storage.exists('posts/old.gif'))
+        self.assertEqual(self.storage.open('posts/old.gif').read(), b'GIF89a')
@@ -1,5 +1,12 @@
+import mimetypes
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
 from django.shortcuts import render
 
+from .caching import cache_policy
+from .fragments import render_fragment
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,25 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def object_media(request, name):
+    """Отдаёт файл из локального объектного хранилища по подписанной ссылке."""
+    client = getattr(default_storage, 'client', None)
+    expires = request.GET.get('expires')
+    signature = request.GET.get('signature', '')
+    if not hasattr(client, 'verify') or not client.verify(
+            name, expires, signature):
+        raise Http404
+    try:
+        body = open(client.path(name), 'rb')
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(
+        body, content_type=mimetypes.guess_type(name)[0])
+
+
+@cache_policy()
+def fragment(request, name):
+    """Персональная часть страницы, загружается отдельно от каркаса."""
+    return render_fragment(request, name)
@@ -1,9 +1,160 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+from django.http import Http404, JsonResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 
+from . import moderation
 from .models import Group, Post, Comment, Follow
+from .search import match_expression
+from .sharding import SHARDED_MODELS, databases
 
 
-class PostAdmin(admin.ModelAdmin):
+def table_estimate(model, aliases):
+    """Число строк таблицы по статистике планировщика или None.
+
+    PostgreSQL хранит оценку в pg_class.reltuples, SQLite - в sqlite_stat1
+    после ANALYZE. Для шардированной модели оценки шардов складываются.
+    """
+    table = model._meta.db_table
+    total = 0
+    for alias in aliases:
+        db = connections[alias]
+        with db.cursor() as cursor:
+            if db.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [table],
+                )
+            elif db.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table],
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        estimate = int(str(row[0]).split()[0])
+        if estimate <= 0:
+            return None
+        total += estimate
+    return total
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для списка без фильтров берёт оценку числа строк вместо COUNT(*).
+
+    Без статистики строки считаются, но не дальше ADMIN_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        model = queryset.model
+        if model._meta.label_lower in SHARDED_MODELS and queryset._db is None:
+            aliases = databases()
+        else:
+            aliases = [queryset.db]
+        estimate = table_estimate(model, aliases)
+        if estimate is not None:
+            return estimate
+        return queryset.order_by().values('pk')[
+            :settings.ADMIN_COUNT_LIMIT].count()
+
+
+class ChangelistRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id без подписи объекта: подпись стоила бы запроса на строку."""
+
+    def label_and_url_for_value(self, value):
+        return '', ''
+
+
+class FullTextSearchMixin:
+    """Поиск по тексту через полнотекстовый индекс вместо LIKE.
+
+    В SQLite используется таблица FTS5 fts_table из миграции
+    0013_fulltext_search, в PostgreSQL - SearchVector. В остальных
+    базах поиск обычный, по search_fields.
+    """
+
+    fts_table = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.split():
+            return queryset, False
+        if connection.vendor == 'sqlite':
+            ids = RawSQL(
+                f'SELECT rowid FROM {self.fts_table} '
+                f'WHERE {self.fts_table} MATCH %s',
+                [match_expression(search_term)],
+            )
+            return queryset.filter(pk__in=ids), False
+        if connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import (
+                SearchQuery, SearchVector)
+            return queryset.annotate(
+                search=SearchVector('text')
+            ).filter(search=SearchQuery(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class ModerationActionForm(helpers.ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа')
+
+
+class ModerationMixin:
+    """Запуск массовых действий из posts.moderation с отчётом в админке."""
+
+    def run_moderation(self, request, job, args, total):
+        progress = moderation.run(job, args, total)
+        if total <= 0:
+            self.message_user(request, 'Нечего обрабатывать.',
+                              messages.WARNING)
+        elif moderation.get_progress(progress.job_id)['status'] == 'done':
+            self.message_user(request, f'Обработано строк: {total}.')
+        else:
+            url = reverse('admin:posts_moderation_progress',
+                          args=(progress.job_id,))
+            self.message_user(request, format_html(
+                'Обработка {} строк запущена в фоне, '
+                '<a href="{}">прогресс</a>.', total, url))
+
+    def selected_authors(self, queryset):
+        """Id авторов выбранных строк.
+
+        Список, а не подзапрос: в каждом шарде подзапрос видел бы только
+        выбранные строки этого шарда.
+        """
+        return list(queryset.values_list('author_id', flat=True).distinct())
+
+    def purge_authors(self, request, queryset):
+        user_ids = self.selected_authors(queryset)
+        total = (Post.objects.filter(author__in=user_ids).count()
+                 + Comment.objects.filter(author__in=user_ids).count())
+        self.run_moderation(
+            request, moderation.purge_users, (user_ids,), total)
+    purge_authors.short_description = (
+        'Удалить все посты и комментарии авторов выбранных записей')
+
+
+class PostAdmin(ModerationMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,9 +163,60 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
     search_fields = ('text',)
+    fts_table = 'posts_post_fts'
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    action_form = ModerationActionForm
+    actions = ('delete_authors_posts', 'move_to_group', 'purge_authors')
+
+    def get_urls(self):
+        return [
+            path('moderation/<str:job_id>/',
+                 self.admin_site.admin_view(self.moderation_progress),
+                 name='posts_moderation_progress'),
+        ] + super().get_urls()
+
+    def moderation_progress(self, request, job_id):
+        progress = moderation.get_progress(job_id)
+        if progress is None:
+            raise Http404
+        return JsonResponse(progress)
+
+    def delete_authors_posts(self, request, queryset):
+        post_ids = list(Post.objects.filter(
+            author__in=self.selected_authors(queryset)
+        ).values_list('pk', flat=True))
+        self.run_moderation(
+            request, moderation.delete_posts, (post_ids,), len(post_ids))
+    delete_authors_posts.short_description = (
+        'Удалить все посты авторов выбранных записей')
+
+    def move_to_group(self, request, queryset):
+        try:
+            group = ModerationActionForm().fields['group'].clean(
+                request.POST.get('group'))
+        except ValidationError:
+            group = None
+        if group is None:
+            self.message_user(request, 'Выберите группу.', messages.ERROR)
+            return
+        post_ids = list(queryset.values_list('pk', flat=True))
+        self.run_moderation(
+            request, moderation.move_posts, (post_ids, group), len(post_ids))
+    move_to_group.short_description = 'Перенести выбранные записи в группу'
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('widgets', {
+            'group': ChangelistRawIdWidget(
+                Post._meta.get_field('group').remote_field, self.admin_site),
+        })
+        return super().get_changelist_form(request, **kwargs)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -24,17 +226,35 @@ class GroupAdmin(admin.ModelAdmin):
         'title',
         'description'
     )
+    search_fields = ('title', 'slug')
     prepopulated_fields = {'slug': ('title',)}
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ModerationMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
         'author',
     )
+    list_select_related = ('author',)
+    raw_id_fields = ('author', 'post')
     search_fields = ('text',)
+    fts_table = 'posts_comment_fts'
     list_filter = ('created',)
+    date_hierarchy = 'created'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_authors_comments', 'purge_authors')
+
+    def delete_authors_comments(self, request, queryset):
+        comment_ids = list(Comment.objects.filter(
+            author__in=self.selected_authors(queryset)
+        ).values_list('pk', flat=True))
+        self.run_moderation(
+            request, moderation.delete_comments, (comment_ids,),
+            len(comment_ids))
+    delete_authors_comments.short_description = (
+        'Удалить все комментарии авторов выбранных комментариев')
 
 
 class FollowAdmin(admin.ModelAdmin):
@@ -43,6 +263,10 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
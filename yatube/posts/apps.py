@@ -1,5 +1,25 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def restore_fts(sender, using, **kwargs):
+    from django.db import connections
+    from .search import ensure_fts
+    ensure_fts(connections[using])
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        post_migrate.connect(restore_fts, sender=self)
+        if settings.SHARD_ALIASES:
+            # Копии в шардах обновляются раньше остальных приёмников.
+            from .sharding import replicate, seed_sequences, unreplicate
+            post_migrate.connect(seed_sequences, sender=self)
+            for model in (get_user_model(), self.get_model('Group')):
+                post_save.connect(replicate, sender=model)
+                post_delete.connect(unreplicate, sender=model)
+        from . import fragments, signals  # noqa: F401
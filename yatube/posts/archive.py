@@ -0,0 +1,87 @@
+import json
+import zlib
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .authors import invalidate_author_summary
+from .groups import refresh_group_stats
+from .moderation import raw_delete
+from .delta import log_changes
+from .models import ArchivedPost, Comment, Post, PostChange
+from .sharding import databases
+from .utils import invalidate_partitions
+
+
+def pack_comments(comments):
+    return zlib.compress(json.dumps([
+        {
+            'author_id': comment.author_id,
+            'author': comment.author.username,
+            'text': comment.text,
+            'text_html': comment.text_html,
+            'created': comment.created.isoformat(),
+        }
+        for comment in comments
+    ]).encode())
+
+
+def unpack_comments(data):
+    """Комментарии архивного поста в виде, удобном шаблону comments.html."""
+    comments = json.loads(zlib.decompress(bytes(data)))
+    for comment in comments:
+        comment['created'] = parse_datetime(comment['created'])
+    return [SimpleNamespace(**comment) for comment in comments]
+
+
+def archive_batch(posts):
+    comments = {}
+    for comment in Comment.objects.using(posts[0]._state.db).filter(
+            post__in=posts).select_related('author').order_by('-created'):
+        comments.setdefault(comment.post_id, []).append(comment)
+    ArchivedPost.objects.bulk_create([
+        ArchivedPost(
+            id=post.pk,
+            text=post.text,
+            text_html=post.text_html,
+            pub_date=post.pub_date,
+            author_id=post.author_id,
+            group_id=post.group_id,
+            image=post.image.name,
+            comments_data=pack_comments(comments.get(post.pk, ())),
+        )
+        for post in posts
+    ], ignore_conflicts=True)
+    raw_delete(Post, [post.pk for post in posts])
+    log_changes(PostChange.DELETED, [
+        (post.pk, post.author_id, post.group_id) for post in posts])
+
+
+def archive_posts(before, batch_size=500):
+    """Переносит посты старше before в ArchivedPost порциями.
+
+    Каждая порция переносится в своей транзакции, так что пост
+    всегда есть ровно в одной из таблиц. Посты шарда удаляются в
+    транзакции шарда: если она сорвётся, копия в архиве останется, и
+    повторный запуск перенесёт порцию заново поверх неё.
+    """
+    archived = 0
+    group_ids, author_ids = set(), set()
+    for alias in databases():
+        while True:
+            with transaction.atomic(using=alias):
+                posts = list(
+                    Post.objects.using(alias).filter(pub_date__lt=before)
+                    .order_by('pk')[:batch_size]
+                )
+                if not posts:
+                    break
+                archive_batch(posts)
+            archived += len(posts)
+            group_ids |= {post.group_id for post in posts} - {None}
+            author_ids |= {post.author_id for post in posts}
+    refresh_group_stats(group_ids)
+    invalidate_author_summary(*author_ids)
+    invalidate_partitions()
+    return archived
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
+from django.http import Http404
+
+from .models import Follow, Post, User
+from .sharding import author_db, databases
+
+AUTHOR_SUMMARY_KEY = 'author_summary:{}'
+AUTHOR_SUMMARY_TIMEOUT = 60 * 60
+USERNAME_KEY = 'username:{}'
+USERNAME_LOWER_KEY = 'username_lower:{}'
+USERNAME_TIMEOUT = 60 * 60 * 24
+
+
+def get_author_summary(author_id):
+    """Имя автора, число постов, подписчиков и подписок, дата поста.
+
+    Считается один раз и хранится в кэше до изменения постов,
+    подписок или самого пользователя: по нему профиль строится без
+    запроса к пользователям. Нет такого пользователя — 404.
+    """
+    key = AUTHOR_SUMMARY_KEY.format(author_id)
+    summary = cache.get(key)
+    if summary is None:
+        author = User.objects.filter(pk=author_id).only(
+            'username', 'first_name', 'last_name').first()
+        if author is None:
+            raise Http404
+        db = author_db(author.pk)
+        posts = Post.objects.using(db).filter(author=author).aggregate(
+            count=Count('pk'), last=Max('pub_date'))
+        followers = Follow.objects.using(db).filter(author=author)
+        summary = {
+            'username': author.username,
+            'full_name': author.get_full_name(),
+            'posts_count': posts['count'],
+            'last_post': posts['last'],
+            'followers_count': followers.count(),
+            'following_count': sum(
+                Follow.objects.using(alias).filter(user=author).count()
+                for alias in databases()
+            ),
+        }
+        cache.set(key, summary, AUTHOR_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_author_summary(*user_ids):
+    cache.delete_many([AUTHOR_SUMMARY_KEY.format(pk) for pk in user_ids])
+
+
+def resolve_username(username):
+    """Id и точное имя пользователя по имени или 404.
+
+    Сначала ищется точное имя, и только если его нет — то же имя без учёта
+    регистра по индексу lower(username). Обе находки хранятся в кэше, так
+    что разбор адреса профиля обычно обходится без запроса. lower() в
+    SQLite приводит к нижнему регистру только ASCII, поэтому кириллическое
+    имя в другом регистре там не найдётся, а точное — найдётся всегда.
+    """
+    key = USERNAME_KEY.format(username)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = User.objects.filter(username=username).values_list(
+            'pk', flat=True).first()
+        if author_id is not None:
+            cache.set(key, author_id, USERNAME_TIMEOUT)
+    if author_id is not None:
+        return author_id, username
+    key = USERNAME_LOWER_KEY.format(username.lower())
+    found = cache.get(key)
+    if found is None:
+        found = User.objects.annotate(
+            username_lower=Lower('username'),
+        ).filter(username_lower=username.lower()).order_by('pk').values_list(
+            'pk', 'username').first()
+        if found is None:
+            raise Http404
+        cache.set(key, found, USERNAME_TIMEOUT)
+    return found
+
+
+def invalidate_username(*usernames):
+    cache.delete_many([
+        key
+        for username in usernames
+        for key in (USERNAME_KEY.format(username),
+                    USERNAME_LOWER_KEY.format(username.lower()))
+    ])
@@ -0,0 +1,146 @@
+import heapq
+import json
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import ChangeConsumer, ChangeEvent
+from .sharding import is_replica, log_databases, row_db
+
+LOGGED_MODELS = ('posts.group', 'posts.post', 'posts.comment', 'posts.follow')
+
+
+def is_logged(model):
+    return model._meta.label_lower in LOGGED_MODELS
+
+
+def snapshot(instance):
+    fields = serializers.serialize('python', [instance])[0]['fields']
+    return json.dumps(fields, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _log(events):
+    by_db = defaultdict(list)
+    for event in events:
+        by_db[row_db(event.model, event.object_id)].append(event)
+    for using, batch in by_db.items():
+        ChangeEvent.objects.using(using).bulk_create(batch)
+
+
+def log_saved(objects, action=ChangeEvent.UPDATED):
+    """Пишет состояние объектов в журнал базы, где лежит сам объект.
+
+    Так событие фиксируется в одной транзакции со строкой и в шарде.
+    """
+    _log(
+        ChangeEvent(model=obj._meta.label_lower, object_id=obj.pk,
+                    action=action, data=snapshot(obj))
+        for obj in objects
+    )
+
+
+def log_deleted(model, ids):
+    _log(
+        ChangeEvent(model=model._meta.label_lower, object_id=pk,
+                    action=ChangeEvent.DELETED)
+        for pk in ids
+    )
+
+
+def object_saved(sender, instance, created, using, raw=False, **kwargs):
+    if not raw and not is_replica(sender, using):
+        log_saved([instance], ChangeEvent.CREATED if created else (
+            ChangeEvent.UPDATED))
+
+
+def object_deleted(sender, instance, using, **kwargs):
+    if not is_replica(sender, using):
+        log_deleted(sender, [instance.pk])
+
+
+class Consumer:
+    """Читатель журнала с сохраняемой позицией.
+
+    poll() отдаёт события после позиции, commit() сдвигает её после
+    обработки, так что после сбоя события читаются повторно. В каждой
+    базе журнала позиция своя, события баз сливаются по времени.
+
+    Id выдаются при вставке, а видны после фиксации, поэтому событие
+    за дырой в id придерживается на CHANGELOG_SETTLE секунд: меньший
+    id может принадлежать ещё не зафиксированной транзакции. Событие
+    транзакции, которая дольше этого срока, может быть пропущено.
+    В SQLite запись идёт в одну транзакцию за раз, и дыр не бывает.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._polled = []
+
+    def position(self, using=DEFAULT_DB_ALIAS):
+        return ChangeConsumer.objects.using(using).filter(
+            name=self.name).values_list('position', flat=True).first() or 0
+
+    def _poll(self, using, limit):
+        position = self.position(using)
+        events = list(ChangeEvent.objects.using(using).filter(
+            pk__gt=position)[:limit])
+        settled = timezone.now() - timedelta(
+            seconds=settings.CHANGELOG_SETTLE)
+        expected = position + 1 if position else None
+        for index, event in enumerate(events):
+            if expected not in (None, event.pk) and event.created > settled:
+                return events[:index]
+            expected = event.pk + 1
+        return events
+
+    def poll(self, limit=100):
+        self._polled = list(islice(heapq.merge(
+            *(self._poll(using, limit) for using in log_databases()),
+            key=attrgetter('created'),
+        ), limit))
+        return self._polled
+
+    def commit(self, event):
+        """Отмечает обработанными события последнего poll() по event."""
+        index = next(index for index, polled in enumerate(self._polled)
+                     if polled is event)
+        positions = {
+            polled._state.db: polled.pk
+            for polled in self._polled[:index + 1]
+        }
+        for using, position in positions.items():
+            ChangeConsumer.objects.using(using).update_or_create(
+                name=self.name, defaults={'position': position})
+
+
+def compact():
+    """Сжимает уже прочитанную всеми читателями часть журнала.
+
+    От каждого объекта остаётся последнее событие, события удалённых
+    объектов убираются целиком. Новый читатель получает из сжатой
+    части снимок текущего состояния. Каждая база журнала сжимается
+    отдельно. Возвращает число удалённых событий.
+    """
+    return sum(_compact(using) for using in log_databases())
+
+
+def _compact(using):
+    position = ChangeConsumer.objects.using(using).aggregate(
+        position=Min('position'))['position']
+    if position is None:
+        return 0
+    read = ChangeEvent.objects.using(using).filter(pk__lte=position)
+    latest = read.order_by().values('model', 'object_id').annotate(
+        last=Max('pk')).values('last')
+    with transaction.atomic(using=using):
+        deleted, _ = read.exclude(pk__in=latest).delete()
+        tombstones, _ = read.filter(action=ChangeEvent.DELETED).delete()
+    return deleted + tombstones
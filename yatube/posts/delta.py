@@ -0,0 +1,167 @@
+import hashlib
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+
+from .follows import get_following_ids
+from .groups import get_group_or_404
+from .models import Post, PostChange
+from .sharding import databases, post_db
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def log_changes(action, rows):
+    """Пишет в журнал правки или удаления постов.
+
+    rows — тройки (id поста, id автора, id группы). Запись идёт в базу
+    поста, в одной транзакции с самой правкой.
+    """
+    by_db = defaultdict(list)
+    for post_id, author_id, group_id in rows:
+        by_db[post_db(post_id)].append(
+            PostChange(post_id=post_id, author_id=author_id,
+                       group_id=group_id, action=action))
+    for using, changes in by_db.items():
+        PostChange.objects.using(using).bulk_create(changes)
+
+
+def log_post_change(action, post, group_ids):
+    log_changes(action, [
+        (post.pk, post.author_id, group_id) for group_id in group_ids])
+
+
+def get_feed(request):
+    """Посты ленты и фильтр её записей в журнале изменений."""
+    feed = request.GET.get('feed')
+    if feed == 'group':
+        group = get_group_or_404(request.GET.get('group', ''))
+        return group.posts.all(), Q(group_id=group.pk)
+    if feed == 'follow':
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        authors = get_following_ids(request.user)
+        return Post.objects.filter(author__in=authors), Q(
+            author_id__in=authors)
+    return Post.objects.all(), Q()
+
+
+def parse_watermark(value):
+    """Водяной знак "<pub_date в мкс>.<id>" -> фильтр новых постов."""
+    timestamp, _, pk = value.partition('.')
+    if not (timestamp.isdigit() and pk.isdigit()):
+        return None
+    pub_date = EPOCH + timedelta(microseconds=int(timestamp))
+    return Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=int(pk))
+
+
+def watermark(pub_date, pk):
+    return f'{(pub_date - EPOCH) // timedelta(microseconds=1)}.{pk}'
+
+
+def parse_cursor(value):
+    """Курсор журнала "<id>.<id>..." -> последний прочитанный id по базам."""
+    positions = value.split('.')
+    if len(positions) != len(databases()) or not all(
+            position.isdigit() for position in positions):
+        return None
+    return dict(zip(databases(), map(int, positions)))
+
+
+def make_cursor(positions):
+    return '.'.join(str(positions[using]) for using in databases())
+
+
+def last_changes(changes):
+    """Последняя запись журнала ленты в каждой базе постов."""
+    return {
+        using: PostChange.objects.using(using).filter(changes).order_by(
+            '-pk').values_list('pk', flat=True).first() or 0
+        for using in databases()
+    }
+
+
+def feed_state(posts, changes):
+    """ETag ленты: последний пост и последние записи журнала."""
+    newest = posts.order_by('-pub_date', '-pk').values_list(
+        'pub_date', 'pk').first()
+    return newest, make_cursor(last_changes(changes))
+
+
+def make_etag(request, state):
+    key = f'{request.get_full_path()}|{state}'
+    return '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+
+def serialize(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'text_html': post.text_html,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def get_delta(request, posts, changes):
+    """Новые посты после водяного знака и изменения после курсора.
+
+    Без водяного знака отдаётся первая страница ленты. Правки
+    разрешаются по текущему состоянию ленты: пост, который в ней
+    уже не виден (удалён, перенесён), приходит как deleted.
+    """
+    limit = settings.DELTA_LIMIT
+    posts = posts.select_related('author', 'group')
+    since = parse_watermark(request.GET.get('since', ''))
+    if since is None:
+        new = list(posts.order_by('-pub_date', '-pk')[:settings.COUNT_STR])
+        new.reverse()
+        more = False
+    else:
+        new = list(posts.filter(since).order_by('pub_date', 'pk')[:limit + 1])
+        more = len(new) > limit
+        new = new[:limit]
+    cursor = parse_cursor(request.GET.get('changes', ''))
+    if cursor is not None:
+        # Журнал каждой базы читается по id, базы сливаются по времени.
+        entries = list(islice(heapq.merge(*(
+            PostChange.objects.using(using).filter(
+                changes, pk__gt=position)[:limit + 1]
+            for using, position in cursor.items()
+        ), key=attrgetter('created')), limit + 1))
+        more = more or len(entries) > limit
+        entries = entries[:limit]
+        for entry in entries:
+            cursor[entry._state.db] = entry.pk
+    else:
+        entries = []
+        cursor = last_changes(changes)
+    visible = posts.in_bulk({entry.post_id for entry in entries})
+    updates = {}
+    for entry in entries:
+        post = visible.get(entry.post_id)
+        updates[entry.post_id] = (
+            {'id': entry.post_id, 'action': PostChange.UPDATED,
+             'post': serialize(post)}
+            if post else
+            {'id': entry.post_id, 'action': PostChange.DELETED}
+        )
+    if new:
+        mark = watermark(new[-1].pub_date, new[-1].pk)
+    else:
+        mark = request.GET.get('since') if since is not None else None
+    return {
+        'posts': [serialize(post) for post in new],
+        'changes': list(updates.values()),
+        'since': mark,
+        'changes_cursor': make_cursor(cursor),
+        'more': more,
+    }
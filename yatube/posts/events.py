@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+EVENTS_BUFFER = 1000
+
+_hub = None
+
+
+class LocalBackend:
+    """Хаб событий в памяти процесса.
+
+    Последние события лежат в кольцевом буфере, подписчики спят на
+    одном Condition и просыпаются только при публикации. Под gevent
+    или eventlet подписчик — гринлет, а не поток, поэтому тысячи
+    открытых соединений почти ничего не стоят.
+    """
+
+    def __init__(self, size=EVENTS_BUFFER):
+        self.events = deque(maxlen=size)
+        self.sequence = 0
+        self.condition = threading.Condition()
+
+    def publish(self, channels):
+        with self.condition:
+            self.sequence += 1
+            self.events.append((self.sequence, frozenset(channels)))
+            self.condition.notify_all()
+
+    def last_id(self):
+        return self.sequence
+
+    def wait(self, after, timeout):
+        """События с номером больше after, ждёт не дольше timeout."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after, timeout)
+            return [event for event in self.events if event[0] > after]
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        _hub = import_string(settings.POST_EVENTS_BACKEND)()
+    return _hub
+
+
+def post_channels(post):
+    channels = ['feed', f'author:{post.author_id}']
+    if post.group_id is not None:
+        channels.append(f'group:{post.group_id}')
+    return channels
+
+
+def publish_post(post):
+    get_hub().publish(post_channels(post))
+
+
+def stream(channels, last_id=None):
+    """Поток SSE: сколько новых постов появилось в каналах.
+
+    Между событиями раз в POST_EVENTS_HEARTBEAT секунд отправляется
+    комментарий, чтобы прокси не закрывали соединение.
+    """
+    hub = get_hub()
+    if last_id is None:
+        last_id = hub.last_id()
+    heartbeat = settings.POST_EVENTS_HEARTBEAT
+    deadline = time.monotonic() + heartbeat
+    while True:
+        events = hub.wait(last_id, max(deadline - time.monotonic(), 0))
+        if events:
+            last_id = events[-1][0]
+        count = sum(1 for _, event_channels in events
+                    if event_channels & channels)
+        if count:
+            data = json.dumps({'count': count})
+            yield f'id: {last_id}\nevent: posts\ndata: {data}\n\n'
+        elif time.monotonic() < deadline:
+            continue
+        else:
+            yield ': ping\n\n'
+        deadline = time.monotonic() + heartbeat
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from .authors import invalidate_author_summary
+from .changelog import log_deleted, log_saved
+from .models import ChangeEvent, Follow
+from .sharding import author_db, union
+from .utils import invalidate_partitions
+
+FOLLOWING_CACHE_KEY = 'following:{}'
+FOLLOWING_CACHE_TIMEOUT = 60 * 60
+
+# Не больше параметров запроса, чем позволяет старый SQLite (999).
+FOLLOW_BATCH_SIZE = 400
+
+
+def get_following_ids(user):
+    """Id авторов, на которых подписан пользователь.
+
+    Загружаются один раз за запрос (запоминаются на объекте request.user)
+    и хранятся в кэше до изменения подписок.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, '_following_ids', None)
+    if ids is None:
+        key = FOLLOWING_CACHE_KEY.format(user.pk)
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(union(
+                Follow.objects.filter(user=user)
+                .values_list('author_id', flat=True)
+            ))
+            cache.set(key, ids, FOLLOWING_CACHE_TIMEOUT)
+        user._following_ids = ids
+    return ids
+
+
+def is_following(user, author):
+    return author.pk in get_following_ids(user)
+
+
+def invalidate_following(user_id):
+    cache.delete(FOLLOWING_CACHE_KEY.format(user_id))
+
+
+def _by_database(author_ids):
+    databases = defaultdict(list)
+    for author_id in author_ids:
+        databases[author_db(author_id)].append(author_id)
+    for db, ids in databases.items():
+        for start in range(0, len(ids), FOLLOW_BATCH_SIZE):
+            yield db, ids[start:start + FOLLOW_BATCH_SIZE]
+
+
+def _execute(db, sql, params):
+    with connections[db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _changed(user, author_ids):
+    # Запросы идут мимо ORM, поэтому сигналы Follow не срабатывают.
+    invalidate_following(user.pk)
+    invalidate_author_summary(user.pk, *author_ids)
+    invalidate_partitions()
+
+
+def follow(user, author_ids):
+    """Подписывает пользователя на авторов.
+
+    Один INSERT ... ON CONFLICT DO NOTHING на пачку авторов по
+    ограничению unique_followings: повторная подписка ничего не меняет
+    и не гоняется с параллельной. На себя подписаться нельзя.
+    Возвращает id авторов, подписка на которых появилась.
+    """
+    table = Follow._meta.db_table
+    created = []
+    for db, ids in _by_database(set(author_ids) - {user.pk}):
+        values = ', '.join(['(%s, %s)'] * len(ids))
+        params = [value for author_id in ids for value in (user.pk, author_id)]
+        with transaction.atomic(using=db):
+            rows = _execute(
+                db,
+                f'INSERT INTO {table} (user_id, author_id) VALUES {values} '
+                f'ON CONFLICT DO NOTHING RETURNING id, author_id',
+                params,
+            )
+            log_saved([Follow(pk=pk, user_id=user.pk, author_id=author_id)
+                       for pk, author_id in rows], ChangeEvent.CREATED)
+        created += [author_id for _, author_id in rows]
+    if created:
+        _changed(user, created)
+    return created
+
+
+def unfollow(user, author_ids):
+    """Отписывает пользователя от авторов одним DELETE на пачку.
+
+    Отписка от тех, на кого пользователь не подписан, ничего не
+    меняет. Возвращает id авторов, подписка на которых удалена.
+    """
+    table = Follow._meta.db_table
+    deleted = []
+    for db, ids in _by_database(set(author_ids)):
+        placeholders = ', '.join(['%s'] * len(ids))
+        with transaction.atomic(using=db):
+            rows = _execute(
+                db,
+                f'DELETE FROM {table} WHERE user_id = %s '
+                f'AND author_id IN ({placeholders}) RETURNING id, author_id',
+                [user.pk, *ids],
+            )
+            log_deleted(Follow, [pk for pk, _ in rows])
+        deleted += [author_id for _, author_id in rows]
+    if deleted:
+        _changed(user, deleted)
+    return deleted
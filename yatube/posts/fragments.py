@@ -0,0 +1,47 @@
+from django.http import HttpResponseBadRequest
+from django.shortcuts import render
+
+from core.fragments import fragment
+
+from .follows import get_following_ids
+from .forms import CommentForm
+
+
+FEEDS = ('index', 'trending', 'follow')
+
+
+@fragment('feed_tabs')
+def feed_tabs(request, active):
+    if active not in FEEDS:
+        return HttpResponseBadRequest()
+    return render(
+        request, 'posts/includes/switcher.html', {'active': active})
+
+
+@fragment('follow_button')
+def follow_button(request, author_id, username):
+    context = {
+        'username': username,
+        'own': str(request.user.pk) == author_id,
+        'following': author_id.isdigit() and int(author_id) in (
+            get_following_ids(request.user)),
+    }
+    return render(request, 'posts/includes/follow_button.html', context)
+
+
+@fragment('post_actions')
+def post_actions(request, post_id, author_id):
+    context = {
+        'post_id': post_id,
+        'own': str(request.user.pk) == author_id,
+    }
+    return render(request, 'posts/includes/post_actions.html', context)
+
+
+@fragment('comment_form')
+def comment_form(request, post_id):
+    context = {
+        'post_id': post_id,
+        'form': CommentForm(),
+    }
+    return render(request, 'includes/comment_form.html', context)
@@ -0,0 +1,82 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import (
+    Case, Count, DateTimeField, F, Max, Value, When,
+)
+from django.shortcuts import get_object_or_404
+
+from .models import Group, GroupStats, Post
+
+GROUPS_VERSION_KEY = 'groups:version'
+GROUP_CACHE_KEY = 'group:{}:{}'
+GROUP_CACHE_TIMEOUT = 60 * 60
+LOCAL_CACHE_SIZE = 1000
+
+# Кэш процесса; его записи сверяются с общей версией групп в кэше.
+_local_groups = {}
+
+
+def groups_version():
+    version = cache.get(GROUPS_VERSION_KEY)
+    if version is None:
+        cache.add(GROUPS_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(GROUPS_VERSION_KEY)
+    return version
+
+
+def invalidate_groups():
+    """Сбрасывает кэши групп во всех процессах сменой версии."""
+    try:
+        cache.incr(GROUPS_VERSION_KEY)
+    except ValueError:
+        cache.set(GROUPS_VERSION_KEY, time.time_ns(), None)
+
+
+def get_group_or_404(slug):
+    """Группа по slug из кэша процесса, общего кэша или базы."""
+    version = groups_version()
+    group = _local_groups.get((version, slug))
+    if group is None:
+        key = GROUP_CACHE_KEY.format(version, slug)
+        group = cache.get(key)
+        if group is None:
+            group = get_object_or_404(Group, slug=slug)
+            cache.set(key, group, GROUP_CACHE_TIMEOUT)
+        if len(_local_groups) >= LOCAL_CACHE_SIZE:
+            _local_groups.clear()
+        _local_groups[(version, slug)] = group
+    return group
+
+
+def refresh_group_stats(group_ids):
+    """Пересчитывает число постов и дату последнего поста групп."""
+    for group_id in group_ids:
+        stats = Post.objects.filter(group_id=group_id).aggregate(
+            posts_count=Count('pk'), last_post=Max('pub_date'))
+        GroupStats.objects.update_or_create(group_id=group_id, defaults=stats)
+
+
+def count_added_post(post):
+    """Учитывает новый пост в статистике его группы без пересчёта."""
+    updated = GroupStats.objects.filter(group_id=post.group_id).update(
+        posts_count=F('posts_count') + 1,
+        last_post=Case(
+            When(last_post__gte=post.pub_date, then=F('last_post')),
+            default=Value(post.pub_date, output_field=DateTimeField()),
+        ),
+    )
+    if not updated:
+        refresh_group_stats([post.group_id])
+
+
+def count_removed_post(post):
+    """Вычитает удалённый пост из статистики группы.
+
+    Пересчёт нужен, только если удалён последний пост группы.
+    """
+    updated = GroupStats.objects.filter(
+        group_id=post.group_id, last_post__gt=post.pub_date,
+    ).update(posts_count=F('posts_count') - 1)
+    if not updated:
+        refresh_group_stats([post.group_id])
@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Измеряет скорость записи постов в 1, 2, 4... SQLite-шарда '
+            '(по процессу на шард).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='1,2,4')
+        parser.add_argument('--posts', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        baseline = None
+        for count in map(int, options['shards'].split(',')):
+            aliases = [self.add_shard(directory, count, number)
+                       for number in range(count)]
+            rate = self.bench(aliases, options['posts'])
+            baseline = baseline or rate
+            self.stdout.write(
+                f'{count} шард(ов): {rate:.0f} постов/с, '
+                f'x{rate / baseline:.2f}')
+
+    def add_shard(self, directory, count, number):
+        alias = f'bench_{count}_{number}'
+        connections.databases[alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, f'{alias}.sqlite3'),
+        }
+        connections.ensure_defaults(alias)
+        with connections[alias].schema_editor() as editor:
+            for model in (User, Group, Post):
+                editor.create_model(model)
+        User.objects.using(alias).bulk_create([User(username=alias)])
+        return alias
+
+    def bench(self, aliases, posts):
+        # bulk_create не шлёт сигналов: журнал изменений, статистика групп
+        # и кэши не пишут в default, и шарды не ждут одну его блокировку.
+        def write(alias):
+            author = User.objects.using(alias).get()
+            manager = Post.objects.using(alias)
+            for number in range(posts // len(aliases)):
+                manager.bulk_create(
+                    [Post(author=author, text=f'Пост {number}')])
+            connections[alias].close()
+
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=write, args=(alias,))
+                   for alias in aliases]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return posts / (time.perf_counter() - start)
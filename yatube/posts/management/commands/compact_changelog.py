@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.changelog import compact
+
+
+class Command(BaseCommand):
+    help = ('Сжимает прочитанную всеми читателями часть журнала '
+            'изменений.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено событий: {compact()}')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import PostRank
+from posts.trending import update_rankings
+
+
+class Command(BaseCommand):
+    help = 'Обновляет рейтинг популярных статей и групп.'
+
+    def handle(self, *args, **options):
+        update_rankings()
+        self.stdout.write(f'Статей в рейтинге: {PostRank.objects.count()}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Follow, Recommendation
+from posts.recommendations import compute_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает таблицу рекомендаций «на кого подписаться».'
+
+    def handle(self, *args, **options):
+        edges = Follow.objects.values_list('user_id', 'author_id').iterator()
+        recommendations = [
+            Recommendation(user_id=user_id, author_id=author_id, score=score)
+            for user_id, scores in compute_recommendations(edges).items()
+            for author_id, score in scores
+        ]
+        with transaction.atomic():
+            Recommendation.objects.all().delete()
+            Recommendation.objects.bulk_create(
+                recommendations, batch_size=1000)
+        self.stdout.write(f'Рекомендаций: {len(recommendations)}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.groups import refresh_group_stats
+from posts.models import Group
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику всех групп.'
+
+    def handle(self, *args, **options):
+        group_ids = list(Group.objects.values_list('pk', flat=True))
+        refresh_group_stats(group_ids)
+        self.stdout.write(f'Групп: {len(group_ids)}')
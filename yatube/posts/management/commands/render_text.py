@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Post
+from posts.utils import render_text
+
+
+class Command(BaseCommand):
+    help = 'Заполняет сохранённый HTML текста постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in (Post, Comment):
+            updated = 0
+            batch = []
+            for obj in model.objects.only('id', 'text').iterator():
+                obj.text_html = render_text(obj.text)
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, ['text_html'])
+                    updated += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ['text_html'])
+                updated += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {updated}')
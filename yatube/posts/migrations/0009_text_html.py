@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+from posts.utils import render_text
+
+
+BATCH_SIZE = 500
+
+
+def fill_text_html(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    for name in ('Post', 'Comment'):
+        objects = apps.get_model('posts', name).objects.using(alias)
+        batch = []
+        for obj in objects.only('id', 'text').iterator():
+            obj.text_html = render_text(obj.text)
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                objects.bulk_update(batch, ['text_html'])
+                batch = []
+        objects.bulk_update(batch, ['text_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_auto_20220829_1607'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML комментария'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.RunPython(fill_text_html, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupRank',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('score', models.FloatField(db_index=True, verbose_name='Оценка')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг группы',
+                'verbose_name_plural': 'Рейтинг групп',
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.CreateModel(
+            name='PostRank',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='posts.Post', verbose_name='Статья')),
+                ('score', models.FloatField(db_index=True, verbose_name='Оценка')),
+                ('computed', models.DateTimeField(verbose_name='Пересчитано')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг статьи',
+                'verbose_name_plural': 'Рейтинг статей',
+                'ordering': ('-score',),
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+from posts.search import drop_fts, ensure_fts, rebuild_fts
+
+
+def create_fts(apps, schema_editor):
+    ensure_fts(schema_editor.connection)
+    rebuild_fts(schema_editor.connection)
+
+
+def remove_fts(apps, schema_editor):
+    drop_fts(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_groupstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата публикации'),
+        ),
+        migrations.RunPython(create_fts, remove_fts),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='Id поста')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('text_html', models.TextField(blank=True, verbose_name='HTML текста')),
+                ('pub_date', models.DateTimeField(db_index=True, verbose_name='Дата публикации')),
+                ('image', models.ImageField(blank=True, upload_to='posts/', verbose_name='Картинка')),
+                ('comments_data', models.BinaryField(verbose_name='Комментарии (zlib, JSON)')),
+                ('archived', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор статьи')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to='posts.Group', verbose_name='Группа статьи')),
+            ],
+            options={
+                'verbose_name': 'Архивная статья',
+                'verbose_name_plural': 'Архивные статьи',
+                'ordering': ('-pub_date',),
+            },
+        ),
+    ]
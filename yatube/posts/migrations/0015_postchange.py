@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_archivedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.IntegerField(verbose_name='Id поста')),
+                ('author_id', models.IntegerField(db_index=True, verbose_name='Id автора')),
+                ('group_id', models.IntegerField(db_index=True, null=True, verbose_name='Id группы')),
+                ('action', models.CharField(choices=[('updated', 'Изменён'), ('deleted', 'Удалён')], max_length=16, verbose_name='Действие')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Изменение статьи',
+                'verbose_name_plural': 'Изменения статей',
+                'ordering': ('pk',),
+            },
+        ),
+    ]
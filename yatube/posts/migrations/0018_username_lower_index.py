@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0017_post_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_username_lower '
+            'ON auth_user (lower(username))',
+            'DROP INDEX IF EXISTS auth_user_username_lower',
+        ),
+    ]
@@ -1,10 +1,30 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
+
+from .sharding import ShardedQuerySet
+from .utils import render_text
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class ChangeLogged(models.Model):
+    """Модель, изменения которой пишутся в ChangeEvent.
+
+    Сохранение идёт в транзакции, поэтому событие из сигнала post_save
+    (см. posts.changelog) фиксируется вместе с самой строкой.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class Group(ChangeLogged):
     title = models.CharField(
         'Название группы',
         max_length=200
@@ -23,11 +43,16 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(ChangeLogged):
     text = models.TextField(
         'Текст',
         help_text='Введите текст поста'
     )
+    text_html = models.TextField(
+        'HTML текста',
+        blank=True,
+        editable=False,
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
@@ -54,6 +79,13 @@ class Post(models.Model):
         blank=True,
         help_text='Загрузите картинку'
     )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False,
+    )
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
@@ -63,8 +95,52 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:30]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Группа до правки нужна, чтобы пересчитать статистику обеих групп.
+        post._loaded_group_id = post.__dict__.get('group_id')
+        return post
+
+    def save(self, *args, bump_version=True, **kwargs):
+        """Сохраняет пост; правка существующего поста поднимает version.
+
+        Версия пишется тем же UPDATE, что и остальные поля.
+        bump_version=False — версию уже подняли (см. save_changes).
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.text_html = render_text(self.text)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'text_html'}
+        if bump_version and not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+    def save_changes(self, fields, version):
+        """Сохраняет только поля fields, если пост всё ещё версии version.
 
-class Comment(models.Model):
+        Версия поднимается условным UPDATE до записи полей, поэтому из двух
+        одновременных правок одной версии проходит только первая. Возвращает
+        False, если пост успели изменить.
+        """
+        if not fields:
+            return True
+        using = router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            claimed = type(self)._base_manager.using(using).filter(
+                pk=self.pk, version=version,
+            ).update(version=models.F('version') + 1)
+            if not claimed:
+                return False
+            self.version = version + 1
+            self.save(using=using, update_fields=fields, bump_version=False)
+        return True
+
+
+class Comment(ChangeLogged):
     post = models.ForeignKey(
         Post, on_delete=models.CASCADE,
         related_name='comments',
@@ -78,11 +154,19 @@ class Comment(models.Model):
     text = models.TextField(
         verbose_name='Текст комментария',
     )
+    text_html = models.TextField(
+        verbose_name='HTML комментария',
+        blank=True,
+        editable=False,
+    )
     created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации',
+        db_index=True,
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Комментарий'
@@ -91,8 +175,12 @@ class Comment(models.Model):
     def __str__(self):
         return self.text[:30]
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_text(self.text)
+        super().save(*args, **kwargs)
+
 
-class Follow(models.Model):
+class Follow(ChangeLogged):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE,
         related_name='follower',
@@ -104,6 +192,8 @@ class Follow(models.Model):
         verbose_name='Автор статьи',
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -116,3 +206,199 @@ class Follow(models.Model):
 
     def __str__(self):
         return self.text[:30]
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор',
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ('-score',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_recommendations'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+        verbose_name = 'Рекомендация автора'
+        verbose_name_plural = 'Рекомендации авторов'
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class PostRank(models.Model):
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rank',
+        verbose_name='Статья',
+    )
+    score = models.FloatField('Оценка', db_index=True)
+    computed = models.DateTimeField('Пересчитано')
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Рейтинг статьи'
+        verbose_name_plural = 'Рейтинг статей'
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
+
+
+class GroupRank(models.Model):
+    group = models.OneToOneField(
+        Group, on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rank',
+        verbose_name='Группа',
+    )
+    score = models.FloatField('Оценка', db_index=True)
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Рейтинг группы'
+        verbose_name_plural = 'Рейтинг групп'
+
+    def __str__(self):
+        return f'{self.group_id}: {self.score:.2f}'
+
+
+class GroupStats(models.Model):
+    group = models.OneToOneField(
+        Group, on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    last_post = models.DateTimeField('Последний пост', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+    def __str__(self):
+        return f'{self.group_id}: {self.posts_count}'
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый из Post вместе с комментариями."""
+
+    id = models.IntegerField('Id поста', primary_key=True)
+    text = models.TextField('Текст')
+    text_html = models.TextField('HTML текста', blank=True)
+    pub_date = models.DateTimeField('Дата публикации', db_index=True)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор статьи',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='archived_posts',
+        verbose_name='Группа статьи',
+    )
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    comments_data = models.BinaryField('Комментарии (zlib, JSON)')
+    archived = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Архивная статья'
+        verbose_name_plural = 'Архивные статьи'
+
+    def __str__(self):
+        return self.text[:30]
+
+
+class PostChange(models.Model):
+    """Правка или удаление поста, для дельта-ленты.
+
+    Внешних ключей нет: запись переживает удалённый пост. При переносе
+    в другую группу пишутся две записи, для старой и новой группы.
+    """
+
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (UPDATED, 'Изменён'),
+        (DELETED, 'Удалён'),
+    )
+
+    post_id = models.IntegerField('Id поста')
+    author_id = models.IntegerField('Id автора', db_index=True)
+    group_id = models.IntegerField('Id группы', null=True, db_index=True)
+    action = models.CharField('Действие', max_length=16, choices=ACTIONS)
+    created = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        ordering = ('pk',)
+        verbose_name = 'Изменение статьи'
+        verbose_name_plural = 'Изменения статей'
+
+    def __str__(self):
+        return f'{self.post_id}: {self.action}'
+
+
+class ChangeEvent(models.Model):
+    """Событие журнала изменений: id — его порядковый номер."""
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'Создан'),
+        (UPDATED, 'Изменён'),
+        (DELETED, 'Удалён'),
+    )
+
+    model = models.CharField('Модель', max_length=64)
+    object_id = models.IntegerField('Id объекта')
+    action = models.CharField('Действие', max_length=16, choices=ACTIONS)
+    data = models.TextField('Поля объекта (JSON)', blank=True)
+    created = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        ordering = ('pk',)
+        indexes = [
+            models.Index(fields=['model', 'object_id']),
+        ]
+        verbose_name = 'Событие журнала'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.pk}: {self.model} {self.object_id} {self.action}'
+
+
+class ChangeConsumer(models.Model):
+    """Читатель журнала и номер последнего обработанного события."""
+
+    name = models.CharField('Имя', max_length=64, primary_key=True)
+    position = models.PositiveIntegerField('Прочитано до', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Читатель журнала'
+        verbose_name_plural = 'Читатели журнала'
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
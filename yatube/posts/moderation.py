@@ -0,0 +1,170 @@
+import threading
+import uuid
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import CASCADE, F
+
+from .authors import invalidate_author_summary
+from .changelog import is_logged, log_deleted, log_saved
+from .groups import refresh_group_stats
+from .delta import log_changes
+from .models import Comment, Post, PostChange
+from .sharding import SHARDED_MODELS, post_db
+from .utils import invalidate_partitions
+
+PROGRESS_KEY = 'moderation:{}'
+PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+class Progress:
+    """Прогресс модерации в кэше, его читает страница прогресса в админке."""
+
+    def __init__(self, total, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.total = total
+        self.done = 0
+        self.save('running')
+
+    def advance(self, count):
+        self.done += count
+        self.save('running')
+
+    def save(self, status):
+        cache.set(PROGRESS_KEY.format(self.job_id), {
+            'status': status,
+            'done': self.done,
+            'total': self.total,
+        }, PROGRESS_TIMEOUT)
+
+
+def get_progress(job_id):
+    return cache.get(PROGRESS_KEY.format(job_id))
+
+
+def batches(ids):
+    size = settings.MODERATION_BATCH_SIZE
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def by_database(model, items, key=None):
+    """Id (или строки с id, достаёт key), разложенные по базам строк."""
+    if model._meta.label_lower not in SHARDED_MODELS:
+        return {router.db_for_write(model): list(items)}
+    databases = defaultdict(list)
+    for item in items:
+        databases[post_db(key(item) if key else item)].append(item)
+    return databases
+
+
+def raw_delete(model, ids):
+    """Удаляет строки и зависимые от них одним DELETE на таблицу.
+
+    Collector и сигналы не используются: события журнала изменений
+    пишутся здесь же, счётчики и кэши обновляются после всей операции.
+    Зависимые строки шардируемых моделей лежат в шарде основной.
+    """
+    for using, shard_ids in by_database(model, ids).items():
+        _raw_delete(model, shard_ids, using)
+
+
+def _raw_delete(model, ids, using):
+    for relation in model._meta.related_objects:
+        if relation.on_delete is CASCADE:
+            manager = relation.related_model._base_manager.using(using)
+            related = manager.filter(**{
+                f'{relation.field.name}__in': ids,
+            })
+            if is_logged(relation.related_model):
+                log_deleted(relation.related_model,
+                            related.values_list('pk', flat=True))
+            related._raw_delete(using)
+    if is_logged(model):
+        log_deleted(model, ids)
+    model._base_manager.using(using).filter(pk__in=ids)._raw_delete(using)
+
+
+def delete_posts(post_ids, progress):
+    rows = list(Post.objects.filter(pk__in=list(post_ids)).values_list(
+        'pk', 'author_id', 'group_id'))
+    group_ids = {group_id for _, _, group_id in rows} - {None}
+    author_ids = {author_id for _, author_id, _ in rows}
+    for using, shard_rows in by_database(
+            Post, rows, key=itemgetter(0)).items():
+        for batch in batches(shard_rows):
+            with transaction.atomic(using=using):
+                _raw_delete(Post, [pk for pk, _, _ in batch], using)
+                log_changes(PostChange.DELETED, batch)
+            progress.advance(len(batch))
+    refresh_group_stats(group_ids)
+    invalidate_author_summary(*author_ids)
+    invalidate_partitions()
+
+
+def delete_comments(comment_ids, progress):
+    for using, shard_ids in by_database(Comment, comment_ids).items():
+        for batch in batches(shard_ids):
+            with transaction.atomic(using=using):
+                _raw_delete(Comment, batch, using)
+            progress.advance(len(batch))
+
+
+def move_posts(post_ids, group, progress):
+    rows = list(Post.objects.filter(pk__in=list(post_ids)).values_list(
+        'pk', 'author_id', 'group_id'))
+    group_ids = {group_id for _, _, group_id in rows} - {None}
+    for using, shard_rows in by_database(
+            Post, rows, key=itemgetter(0)).items():
+        for batch in batches(shard_rows):
+            with transaction.atomic(using=using):
+                moved = Post.objects.using(using).filter(
+                    pk__in=[pk for pk, _, _ in batch])
+                moved.update(group=group, version=F('version') + 1)
+                log_saved(moved)
+                log_changes(PostChange.UPDATED, batch + [
+                    (pk, author_id, group.pk) for pk, author_id, _ in batch])
+            progress.advance(len(batch))
+    refresh_group_stats(group_ids | {group.pk})
+    invalidate_partitions()
+
+
+def purge_users(user_ids, progress):
+    """Удаляет все посты и комментарии пользователей."""
+    delete_comments(
+        Comment.objects.filter(author__in=user_ids)
+        .values_list('pk', flat=True), progress)
+    delete_posts(
+        Post.objects.filter(author__in=user_ids)
+        .values_list('pk', flat=True), progress)
+
+
+def _run(job, args, progress):
+    try:
+        job(*args, progress)
+        progress.save('done')
+    except Exception:
+        progress.save('failed')
+        raise
+    finally:
+        # Поток открывает соединения и с default, и с шардами.
+        connections.close_all()
+
+
+def run(job, args, total):
+    """Выполняет задачу модерации сразу или, если строк много, в потоке.
+
+    Возвращает Progress; для фоновой задачи её прогресс доступен
+    по progress.job_id.
+    """
+    progress = Progress(total)
+    if total <= settings.MODERATION_BACKGROUND_THRESHOLD:
+        job(*args, progress)
+        progress.save('done')
+    else:
+        threading.Thread(
+            target=_run, args=(job, args, progress), daemon=True).start()
+    return progress
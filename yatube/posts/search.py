@@ -0,0 +1,71 @@
+# Полнотекстовые индексы FTS5 для поиска по постам и комментариям в SQLite.
+FTS_TABLES = (
+    ('posts_post_fts', 'posts_post'),
+    ('posts_comment_fts', 'posts_comment'),
+)
+
+
+def ensure_fts(connection):
+    """Создаёт таблицы FTS5 и триггеры синхронизации, если их нет.
+
+    SQLite пересоздаёт таблицу при изменении её схемы в миграциях,
+    а вместе со старой таблицей удаляются и триггеры, поэтому функция
+    вызывается и после каждого migrate.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    tables = connection.introspection.table_names()
+    with connection.cursor() as cursor:
+        for fts, table in FTS_TABLES:
+            if table not in tables:
+                continue
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"text, content='{table}', content_rowid='id')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai "
+                f"AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); "
+                f"END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad "
+                f"AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, text) "
+                f"VALUES ('delete', old.id, old.text); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au "
+                f"AFTER UPDATE OF text ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, text) "
+                f"VALUES ('delete', old.id, old.text); "
+                f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); "
+                f"END"
+            )
+
+
+def rebuild_fts(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for fts, _ in FTS_TABLES:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_fts(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for fts, _ in FTS_TABLES:
+            for trigger in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def match_expression(search_term):
+    """Слова запроса как префиксы: 'пост тест' -> '"пост"* "тест"*'."""
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""'))
+        for word in search_term.split()
+    )
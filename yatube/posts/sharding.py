@@ -0,0 +1,358 @@
+import heapq
+from collections import Counter, defaultdict
+from functools import reduce
+from itertools import chain, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections, models, router
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.query import (
+    FlatValuesListIterable, ModelIterable, ValuesIterable,
+)
+from django.utils.functional import cached_property
+
+# Диапазон id на шард: по id поста сразу понятно, где он хранится.
+SHARD_ID_RANGE = 10 ** 12
+
+SHARDED_MODELS = (
+    'posts.post', 'posts.comment', 'posts.follow', 'posts.postrank',
+)
+REPLICATED_MODELS = ('auth.user', 'posts.group')
+
+
+def is_enabled():
+    return bool(settings.SHARD_ALIASES)
+
+
+def databases():
+    """Базы, в которых лежат посты, комментарии и подписки."""
+    return settings.SHARD_ALIASES or [DEFAULT_DB_ALIAS]
+
+
+def author_db(author_id):
+    """База автора: его посты, комментарии к ним и подписчики."""
+    if not is_enabled():
+        return DEFAULT_DB_ALIAS
+    return settings.SHARD_ALIASES[author_id % len(settings.SHARD_ALIASES)]
+
+
+def post_db(post_id):
+    """База поста, комментария, подписки или рейтинга по его id."""
+    if not is_enabled():
+        return DEFAULT_DB_ALIAS
+    index = int(post_id) // SHARD_ID_RANGE
+    if index >= len(settings.SHARD_ALIASES):
+        return DEFAULT_DB_ALIAS
+    return settings.SHARD_ALIASES[index]
+
+
+def log_databases():
+    """Базы журналов изменений: default и шарды."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *settings.SHARD_ALIASES]))
+
+
+def row_db(label, pk):
+    """База строки модели label по её id: там же пишется журнал о ней."""
+    if label in SHARDED_MODELS:
+        return post_db(pk)
+    return DEFAULT_DB_ALIAS
+
+
+def is_replica(model, using):
+    """Строка пользователя или группы — копия в шарде, а не оригинал."""
+    return (model._meta.label_lower in REPLICATED_MODELS
+            and using != DEFAULT_DB_ALIAS)
+
+
+class AuthorShardRouter:
+    """Раскладывает посты, комментарии и подписки по шардам автора.
+
+    Комментарий и рейтинг хранятся рядом со своим постом, подписка —
+    в шарде автора, на которого подписались. Пользователи и группы
+    живут в default и копируются во все шарды, чтобы работали внешние
+    ключи и select_related.
+    """
+
+    def shard(self, model, instance):
+        if model._meta.label_lower not in SHARDED_MODELS or instance is None:
+            return None
+        label = instance._meta.label_lower
+        if label == 'auth.user':
+            return author_db(instance.pk)
+        if label in ('posts.post', 'posts.follow') and instance.author_id:
+            return author_db(instance.author_id)
+        if label in ('posts.comment', 'posts.postrank') and instance.post_id:
+            return post_db(instance.post_id)
+        if label in SHARDED_MODELS:
+            return instance._state.db
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self.shard(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if labels & set(REPLICATED_MODELS):
+            return True
+        return None
+
+
+class ShardedQuerySet(models.QuerySet):
+    """QuerySet шардируемой модели.
+
+    Если база не выбрана ни через using(), ни подсказкой instance
+    связанного менеджера, при включённом шардировании запрос идёт во все
+    шарды: строки сливаются по сортировке запроса и режутся срезом,
+    count(), exists(), aggregate(), update() и delete() складываются.
+    create() пишет в шард самого объекта.
+    """
+
+    def _scattered(self):
+        return (
+            self._db is None and is_enabled()
+            and AuthorShardRouter().shard(
+                self.model, self._hints.get('instance')) is None
+        )
+
+    def _shards(self):
+        return [self.using(alias) for alias in settings.SHARD_ALIASES]
+
+    def _gather(self):
+        if self.query.group_by is not None:
+            raise NotImplementedError(
+                'Группировка по нескольким шардам не поддерживается.')
+        low, high = self.query.low_mark, self.query.high_mark
+        rows = []
+        for shard in self._shards():
+            shard.query.clear_limits()
+            shard.query.set_limits(high=high)
+            rows += shard
+        if self.query.order_by:
+            ordering = self.query.order_by
+        elif self.query.default_ordering:
+            ordering = self.model._meta.ordering
+        else:
+            ordering = ()
+        if not all(isinstance(name, str) for name in ordering):
+            raise NotImplementedError(
+                'Сортировка выражением по шардам не поддерживается.')
+        keys = [(self._row_key(name.lstrip('-')), name.startswith('-'))
+                for name in ordering]
+        if any(key is None for key, _ in keys):
+            if not self.query.can_filter():
+                raise NotImplementedError(
+                    'В строках среза нет поля сортировки.')
+            # Без среза порядок строк между шардами не важен.
+            keys = []
+        for key, descending in reversed(keys):
+            rows.sort(key=lambda row: (key(row) is not None, key(row)),
+                      reverse=descending)
+        return rows[low:high]
+
+    def _row_key(self, name):
+        """Функция, достающая поле сортировки из строки результата."""
+        pk = self.model._meta.pk.attname
+        if issubclass(self._iterable_class, ModelIterable):
+            parts = (pk if name == 'pk' else name).split(LOOKUP_SEP)
+            return lambda row: reduce(getattr, parts, row)
+        fields = list(self._fields) or [
+            field.attname for field in self.model._meta.concrete_fields]
+        aliases = {'pk', pk} if name in ('pk', pk) else {name}
+        names = [field for field in fields if field in aliases]
+        if not names:
+            return None
+        if issubclass(self._iterable_class, FlatValuesListIterable):
+            return lambda row: row
+        if issubclass(self._iterable_class, ValuesIterable):
+            return itemgetter(names[0])
+        return itemgetter(fields.index(names[0]))
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._scattered():
+            self._result_cache = self._gather()
+            self._prefetch_done = True
+        super()._fetch_all()
+
+    def iterator(self, chunk_size=2000):
+        if not self._scattered():
+            return super().iterator(chunk_size)
+        # Строки идут шард за шардом, без общей сортировки.
+        return chain.from_iterable(
+            shard.iterator(chunk_size) for shard in self._shards())
+
+    def count(self):
+        if self._result_cache is None and self._scattered():
+            if not self.query.can_filter():
+                return len(self)
+            return sum(shard.count() for shard in self._shards())
+        return super().count()
+
+    def exists(self):
+        if self._result_cache is None and self._scattered():
+            return any(shard.exists() for shard in self._shards())
+        return super().exists()
+
+    def aggregate(self, *args, **kwargs):
+        if not self._scattered():
+            return super().aggregate(*args, **kwargs)
+        for arg in args:
+            kwargs[arg.default_alias] = arg
+        results = [shard.aggregate(**kwargs) for shard in self._shards()]
+        merged = {}
+        for name, expression in kwargs.items():
+            values = [result[name] for result in results
+                      if result[name] is not None]
+            if isinstance(expression, (Count, Sum)):
+                merged[name] = sum(values) if values else (
+                    0 if isinstance(expression, Count) else None)
+            elif isinstance(expression, (Max, Min)):
+                pick = max if isinstance(expression, Max) else min
+                merged[name] = pick(values) if values else None
+            else:
+                raise NotImplementedError(
+                    f'{type(expression).__name__} нельзя сложить по шардам.')
+        return merged
+
+    def update(self, **kwargs):
+        if self._scattered():
+            return sum(shard.update(**kwargs) for shard in self._shards())
+        return super().update(**kwargs)
+
+    def delete(self):
+        if not self._scattered():
+            return super().delete()
+        total, counts = 0, Counter()
+        for shard in self._shards():
+            deleted, per_model = shard.delete()
+            total += deleted
+            counts.update(per_model)
+        return total, dict(counts)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if not self._scattered():
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        by_db = defaultdict(list)
+        for obj in objs:
+            by_db[router.db_for_write(self.model, instance=obj)].append(obj)
+        for db, batch in by_db.items():
+            self.using(db).bulk_create(batch, *args, **kwargs)
+        return objs
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True,
+                 using=router.db_for_write(self.model, instance=obj))
+        return obj
+
+
+def replicate(sender, instance, using, raw=False, **kwargs):
+    """Копирует пользователя или группу из default во все шарды."""
+    if using != DEFAULT_DB_ALIAS or raw:
+        return
+    fields = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }
+    for alias in settings.SHARD_ALIASES:
+        manager = sender._base_manager.using(alias)
+        if not manager.filter(pk=instance.pk).update(**fields):
+            manager.bulk_create([sender(**fields)])
+
+
+def unreplicate(sender, instance, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in settings.SHARD_ALIASES:
+        sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def seed_sequences(sender, using, **kwargs):
+    """Сдвигает автоинкремент таблиц шарда в его диапазон id."""
+    if using not in settings.SHARD_ALIASES:
+        return
+    base = settings.SHARD_ALIASES.index(using) * SHARD_ID_RANGE
+    connection = connections[using]
+    tables = [label.replace('.', '_') for label in SHARDED_MODELS]
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = %s '
+                'WHERE name = %s AND seq < %s', [base, table, base])
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                'WHERE NOT EXISTS '
+                '(SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, base, table])
+
+
+def shard_cursor(queryset, chunk_size):
+    """Лениво читает ленту одного шарда порциями.
+
+    Следующая порция продолжается с последнего прочитанного поста
+    по (pub_date, id), без OFFSET.
+    """
+    queryset = queryset.order_by('-pub_date', '-pk')
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]
+        chunk = list(queryset.filter(
+            Q(pub_date__lt=last.pub_date)
+            | Q(pub_date=last.pub_date, pk__lt=last.pk)
+        )[:chunk_size])
+
+
+def feed_key(post):
+    return post.pub_date, post.pk
+
+
+def merge_feeds(cursors):
+    """Слияние отсортированных лент шардов, самые новые посты первыми."""
+    return heapq.merge(*cursors, key=feed_key, reverse=True)
+
+
+def union(queryset):
+    """Значения values_list(flat=True) со всех шардов."""
+    return chain.from_iterable(
+        queryset.using(alias) for alias in databases())
+
+
+class ShardedPaginator(Paginator):
+    """Пагинатор ленты, собранной со всех шардов.
+
+    Каждый шард читается своим курсором, страница — k-way слияние
+    курсоров по pub_date.
+    """
+
+    @cached_property
+    def count(self):
+        return sum(
+            self.object_list.using(alias).count()
+            for alias in settings.SHARD_ALIASES
+        )
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        chunk_size = max(self.per_page, top // len(settings.SHARD_ALIASES))
+        cursors = [
+            shard_cursor(self.object_list.using(alias), chunk_size)
+            for alias in settings.SHARD_ALIASES
+        ]
+        objects = list(islice(merge_feeds(cursors), bottom, top))
+        return self._get_page(objects, number, self)
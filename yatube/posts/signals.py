@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from .authors import invalidate_author_summary, invalidate_username
+from .changelog import log_saved, object_deleted, object_saved
+from .delta import log_post_change
+from .events import publish_post
+from .follows import invalidate_following
+from .groups import (
+    count_added_post, count_removed_post, invalidate_groups,
+    refresh_group_stats,
+)
+from .models import Comment, Follow, Group, Post, PostChange, User
+from .sharding import is_replica
+from .utils import invalidate_partitions
+
+for model in (Group, Post, Comment, Follow):
+    post_save.connect(object_saved, sender=model)
+    post_delete.connect(object_deleted, sender=model)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    invalidate_following(instance.user_id)
+    invalidate_author_summary(instance.user_id, instance.author_id)
+    # От подписок зависит число постов в ленте подписок по месяцам.
+    invalidate_partitions()
+
+
+def renames(update_fields):
+    return update_fields is None or 'username' in update_fields
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Старое имя нужно, чтобы сбросить его запись в кэше имён.
+    if not raw and instance.pk is not None and renames(update_fields):
+        instance._loaded_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    invalidate_author_summary(instance.pk)
+    if renames(update_fields):
+        invalidate_username(*{instance.username} | (
+            {getattr(instance, '_loaded_username', None)} - {None}))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_username(instance.username)
+
+
+@receiver((post_save, post_delete), sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_groups()
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, using, **kwargs):
+    # Посты группы обнуляются через SET_NULL без сигналов.
+    if not is_replica(sender, using):
+        instance._post_ids = list(
+            instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, using, **kwargs):
+    # При шардировании копии группы в шардах (и SET_NULL их постов)
+    # удаляются раньше: unreplicate подключён до этого приёмника.
+    if not is_replica(sender, using):
+        log_saved(Post.objects.filter(pk__in=instance._post_ids))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    loaded_group_id = getattr(instance, '_loaded_group_id', None)
+    group_changed = loaded_group_id != instance.group_id
+    instance._loaded_group_id = instance.group_id
+    if kwargs['created']:
+        if instance.group_id is not None:
+            count_added_post(instance)
+        invalidate_author_summary(instance.author_id)
+        transaction.on_commit(
+            lambda: publish_post(instance), using=kwargs['using'])
+        return
+    # Правка не меняет ни число постов автора, ни дату последнего, поэтому
+    # сбрасываем только то, что зависит от действительно изменённых полей.
+    log_post_change(PostChange.UPDATED, instance,
+                    {loaded_group_id, instance.group_id})
+    if group_changed:
+        invalidate_partitions()
+        refresh_group_stats({loaded_group_id, instance.group_id} - {None})
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    log_post_change(PostChange.DELETED, instance, {instance.group_id})
+    invalidate_author_summary(instance.author_id)
+    invalidate_partitions()
+    if instance.group_id is not None and Group.objects.filter(
+            pk=instance.group_id).exists():
+        count_removed_post(instance)
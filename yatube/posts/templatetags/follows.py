@@ -0,0 +1,10 @@
+from django import template
+
+from posts.follows import is_following
+
+register = template.Library()
+
+
+@register.filter(name='is_following')
+def is_following_filter(user, author):
+    return is_following(user, author)
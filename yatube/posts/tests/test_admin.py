@@ -0,0 +1,163 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import moderation
+from posts.admin import EstimatedCountPaginator
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AdminTests(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.admin,
+            group=cls.group,
+            text='Пост про котиков',
+        )
+        Post.objects.create(author=cls.admin, text='Пост про собак')
+        Comment.objects.create(
+            post=cls.post, author=cls.admin, text='Комментарий про котиков')
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк."""
+        before = self.changelist_queries('post')
+        for number in range(5):
+            user = User.objects.create(username=f'user{number}')
+            Post.objects.create(author=user, group=self.group, text='Пост')
+        self.assertEqual(self.changelist_queries('post'), before)
+
+    def test_count_without_stats_ignores_id_gaps(self):
+        """Без статистики число строк не завышается дырами в id."""
+        for number in range(3):
+            Post.objects.create(author=self.admin, text='Удалённый').delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 1)
+        self.assertEqual(paginator.count, 2)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_fulltext_search(self):
+        """Поиск в админке идёт по полнотекстовому индексу."""
+        cases = (
+            ('post', Post, 'котик'),
+            ('comment', Comment, 'котик'),
+        )
+        for model, model_class, term in cases:
+            with self.subTest(model=model):
+                response = self.admin_client.get(
+                    reverse(f'admin:posts_{model}_changelist'), {'q': term})
+                results = list(response.context['cl'].result_list)
+                self.assertEqual(
+                    results, list(model_class.objects.filter(
+                        text__icontains='котиков')))
+
+    def test_fulltext_index_follows_edits(self):
+        """Индекс обновляется при правке текста."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Пост про хомяков'
+        post.save()
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'хомяк'})
+        self.assertEqual(list(response.context['cl'].result_list), [post])
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def run_action(self, model, action, objects, **data):
+        return self.admin_client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {
+                'action': action,
+                helpers.ACTION_CHECKBOX_NAME: [obj.pk for obj in objects],
+                **data,
+            },
+            follow=True,
+        )
+
+    def test_purge_authors(self):
+        """Очистка удаляет посты и комментарии автора и пересчитывает
+        статистику группы."""
+        spammer = User.objects.create(username='spammer')
+        spam = Post.objects.create(
+            author=spammer, group=self.group, text='Спам')
+        Comment.objects.create(post=self.post, author=spammer, text='Спам')
+        Comment.objects.create(post=spam, author=self.admin, text='Ответ')
+        self.run_action('post', 'purge_authors', [spam])
+        self.assertFalse(Post.objects.filter(author=spammer).exists())
+        self.assertFalse(Comment.objects.filter(author=spammer).exists())
+        self.assertFalse(Comment.objects.filter(post_id=spam.pk).exists())
+        self.group.stats.refresh_from_db()
+        self.assertEqual(self.group.stats.posts_count, 1)
+
+    def test_delete_authors_comments_on_every_shard(self):
+        """Удаляются комментарии автора и в других шардах."""
+        spammer = User.objects.create(username='spammer')
+        comments = [
+            Comment.objects.create(
+                post=Post.objects.create(
+                    author=User.objects.create(username=f'author{number}'),
+                    text='Пост'),
+                author=spammer, text='Спам')
+            for number in range(2)
+        ]
+        self.run_action('comment', 'delete_authors_comments', comments[:1])
+        self.assertFalse(Comment.objects.filter(author=spammer).exists())
+
+    def test_move_to_group(self):
+        """Посты переносятся в выбранную группу."""
+        new_group = Group.objects.create(
+            title='Новая группа',
+            slug='new-group',
+            description='Тестовое описание',
+        )
+        self.run_action(
+            'post', 'move_to_group', [self.post], group=new_group.pk)
+        version = self.post.version
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.group, new_group)
+        self.assertEqual(self.post.version, version + 1)
+        self.assertEqual(new_group.stats.posts_count, 1)
+
+    @override_settings(MODERATION_BACKGROUND_THRESHOLD=0)
+    def test_large_selection_runs_in_background(self):
+        """Большая выборка обрабатывается в фоне с прогрессом."""
+        with mock.patch('posts.moderation.threading.Thread') as thread:
+            response = self.run_action(
+                'comment', 'delete_authors_comments',
+                Comment.objects.all())
+        job, args, progress = thread.call_args[1]['args']
+        self.assertEqual(job, moderation.delete_comments)
+        progress_url = reverse(
+            'admin:posts_moderation_progress', args=(progress.job_id,))
+        self.assertContains(response, progress_url)
+        self.assertEqual(
+            self.admin_client.get(progress_url).json(),
+            {'status': 'running', 'done': 0, 'total': 1})
@@ -0,0 +1,112 @@
+import json
+from itertools import chain
+from operator import attrgetter
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..changelog import Consumer, compact
+from ..models import ChangeEvent, Comment, Follow, Group, Post
+from ..moderation import Progress, delete_posts
+from ..sharding import log_databases
+
+User = get_user_model()
+
+
+class ChangeLogTest(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def log(self):
+        return sorted(chain.from_iterable(
+            ChangeEvent.objects.using(using) for using in log_databases()
+        ), key=attrgetter('created'))
+
+    def events(self):
+        return [(event.model, event.action, event.object_id)
+                for event in self.log()]
+
+    def clear(self):
+        for using in log_databases():
+            ChangeEvent.objects.using(using).all().delete()
+
+    def test_changes_logged_in_order(self):
+        """Создание, правка и удаление пишутся по порядку с данными."""
+        self.clear()
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=group)
+        post.text = 'Правка'
+        post.save()
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow_pk, group_pk = follow.pk, group.pk
+        follow.delete()
+        group.delete()
+        self.assertEqual(self.events(), [
+            ('posts.group', 'created', group_pk),
+            ('posts.post', 'created', post.pk),
+            ('posts.post', 'updated', post.pk),
+            ('posts.follow', 'created', follow_pk),
+            ('posts.follow', 'deleted', follow_pk),
+            ('posts.group', 'deleted', group_pk),
+            ('posts.post', 'updated', post.pk),
+        ])
+        last = [event for event in self.log()
+                if event.model == 'posts.post'][-1]
+        self.assertEqual(last._state.db, post._state.db)
+        self.assertEqual(json.loads(last.data)['group'], None)
+
+    def test_moderation_deletes_logged(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        self.clear()
+        delete_posts([post.pk], Progress(1))
+        self.assertEqual(self.events(), [
+            ('posts.comment', 'deleted', comment.pk),
+            ('posts.post', 'deleted', post.pk),
+        ])
+
+    def test_consumer_checkpoint_and_compaction(self):
+        self.clear()
+        post = Post.objects.create(author=self.author, text='Пост')
+        for number in range(3):
+            post.text = f'Правка {number}'
+            post.save()
+        other = Post.objects.create(author=self.author, text='Другой')
+        other_pk = other.pk
+        other.delete()
+        consumer = Consumer('search')
+        events = consumer.poll(limit=4)
+        self.assertEqual(len(events), 4)
+        consumer.commit(events[-1])
+        self.assertEqual(len(consumer.poll()), 2)
+        compact()
+        self.assertEqual(self.events(), [
+            ('posts.post', 'updated', post.pk),
+            ('posts.post', 'created', other_pk),
+            ('posts.post', 'deleted', other_pk),
+        ])
+        consumer.commit(consumer.poll()[-1])
+        compact()
+        self.assertEqual(self.events(), [
+            ('posts.post', 'updated', post.pk)])
+
+    def test_consumer_waits_for_gaps(self):
+        """Событие за дырой в id ждёт, пока меньший id не зафиксируется."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        consumer = Consumer('gaps')
+        consumer.commit(consumer.poll()[-1])
+        for number in range(2):
+            post.text = f'Правка {number}'
+            post.save()
+        ChangeEvent.objects.using(post._state.db).filter(
+            model='posts.post', action='updated').first().delete()
+        self.assertEqual(consumer.poll(), [])
+        with override_settings(CHANGELOG_SETTLE=0):
+            self.assertEqual(len(consumer.poll()), 1)
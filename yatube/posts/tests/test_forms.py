@@ -5,7 +5,9 @@ from http import HTTPStatus
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.forms import CommentForm
@@ -14,6 +16,8 @@ from posts.models import Post, Group, User, Comment
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class PostFormTests(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -123,6 +127,58 @@ class PostFormTests(TestCase):
         self.assertEqual(paginator_number_old_response, 0)
         self.assertEqual(posts_count_before, Post.objects.count())
 
+    def test_stale_edit_is_rejected(self):
+        # Правка по устаревшей версии не затирает чужую
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Чужая правка'
+        post.save_changes(['text'], post.version)
+        response = self.authorized_author.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'Моя правка', 'group': self.group.pk,
+                  'version': self.post.version},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertContains(
+            response, f'name="version" value="{self.post.version + 1}"',
+            status_code=HTTPStatus.CONFLICT)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Чужая правка')
+
+    def test_any_save_bumps_version(self):
+        # Версию поднимает любое сохранение, не только форма правки
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Правка из админки'
+        with CaptureQueriesContext(connections[post._state.db]) as queries:
+            post.save()
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.version, self.post.version + 1)
+        response = self.authorized_author.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'Моя правка', 'group': self.group.pk,
+                  'version': self.post.version},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+
+    def test_edit_saves_only_changed_fields(self):
+        post = Post.objects.create(
+            author=self.user, text='С картинкой', image=self.uploaded)
+        image_name = post.image.name
+        url = reverse('posts:post_edit', args=(post.pk,))
+        self.authorized_author.post(
+            url, data={'text': 'С картинкой', 'version': post.version})
+        post.refresh_from_db()
+        self.assertEqual(post.version, 1)
+        self.authorized_author.post(
+            url, data={'text': 'Новый\n\nтекст', 'version': post.version})
+        post.refresh_from_db()
+        self.assertEqual(post.version, 2)
+        self.assertEqual(post.image.name, image_name)
+        self.assertEqual(post.text_html, '<p>Новый</p>\n\n<p>текст</p>')
+
     def test_guest_client_create_post(self):
         # Анонимный пользователь не может создать пост
         posts_count = Post.objects.count()
@@ -144,6 +200,8 @@ class PostFormTests(TestCase):
 
 
 class CommentPostCreateTest(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
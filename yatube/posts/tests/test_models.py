@@ -7,6 +7,8 @@ User = get_user_model()
 
 
 class PostModelTest(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -59,3 +61,14 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+    def test_text_html_rendered_on_save(self):
+        """HTML текста сохраняется экранированным при записи поста."""
+        post = Post.objects.create(
+            author=self.user,
+            text='<b>первый</b>\n\nвторой',
+        )
+        self.assertEqual(
+            post.text_html,
+            '<p>&lt;b&gt;первый&lt;/b&gt;</p>\n\n<p>второй</p>',
+        )
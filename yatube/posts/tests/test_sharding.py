@@ -0,0 +1,84 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Post
+from ..sharding import (
+    SHARD_ID_RANGE, AuthorShardRouter, author_db, merge_feeds, post_db
+)
+
+User = get_user_model()
+
+SHARDS = ['shard_0', 'shard_1']
+
+
+@override_settings(SHARD_ALIASES=SHARDS)
+class ShardRoutingTest(SimpleTestCase):
+    def test_posts_and_comments_follow_author_shard(self):
+        """Пост лежит в шарде автора, комментарий — рядом с постом."""
+        router = AuthorShardRouter()
+        post = Post(author_id=3, text='Пост')
+        comment = Comment(post_id=SHARD_ID_RANGE + 5, author_id=2)
+        self.assertEqual(router.db_for_write(Post, instance=post), 'shard_1')
+        self.assertEqual(
+            router.db_for_write(Comment, instance=comment), 'shard_1')
+        self.assertEqual(author_db(4), 'shard_0')
+        self.assertEqual(post_db(7), 'shard_0')
+        self.assertEqual(post_db(SHARD_ID_RANGE * 2), 'default')
+
+    def test_merge_feeds_orders_by_pub_date(self):
+        now = timezone.now()
+        feeds = [
+            [SimpleNamespace(pk=pk, pub_date=now - timedelta(hours=hours))
+             for pk, hours in shard]
+            for shard in ([(1, 0), (2, 3), (3, 5)], [(4, 1), (5, 2)], [])
+        ]
+        merged = [post.pk for post in merge_feeds(map(iter, feeds))]
+        self.assertEqual(merged, [1, 4, 5, 2, 3])
+
+
+@skipUnless(settings.SHARD_ALIASES, 'нужен POST_SHARDS=2 или больше')
+class ShardedFeedTest(TestCase):
+    databases = '__all__'
+
+    def test_index_merges_posts_from_all_shards(self):
+        authors = [User.objects.create(username=f'author{number}')
+                   for number in range(4)]
+        for number in range(12):
+            Post.objects.create(
+                author=authors[number % 4], text=f'Пост {number}')
+        for author in authors:
+            self.assertEqual(
+                Post.objects.using(author_db(author.pk))
+                .filter(author=author).count(), 3)
+        shown = []
+        for page in (1, 2):
+            response = Client().get(reverse('posts:index') + f'?page={page}')
+            shown += [post.text for post in response.context['page_obj']]
+        self.assertEqual(shown, [f'Пост {number}'
+                                 for number in reversed(range(12))])
+
+    def test_queries_without_database_span_all_shards(self):
+        """Запрос без using() читает и меняет строки всех шардов."""
+        authors = [User.objects.create(username=f'author{number}')
+                   for number in range(2)]
+        posts = [Post.objects.create(author=authors[number % 2],
+                                     text=f'Пост {number}')
+                 for number in range(4)]
+        self.assertEqual({post._state.db for post in posts}, set(SHARDS))
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(
+            Post.objects.aggregate(count=Count('pk'), last=Max('pk')),
+            {'count': 4, 'last': max(post.pk for post in posts)})
+        self.assertEqual(list(Post.objects.all()[1:3]), posts[2:0:-1])
+        self.assertEqual(Post.objects.get(pk=posts[1].pk), posts[1])
+        self.assertEqual(Post.objects.update(text='Правка'), 4)
+        self.assertEqual(Post.objects.filter(text='Правка').delete()[0], 4)
+        self.assertFalse(Post.objects.exists())
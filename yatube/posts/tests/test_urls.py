@@ -10,6 +10,8 @@ User = get_user_model()
 
 
 class StaticURLTests(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -32,6 +34,8 @@ class StaticURLTests(TestCase):
         self.authorized_client.force_login(self.authclient)
         self.url_status = (
             ('posts:index', None,),
+            ('posts:trending', None,),
+            ('posts:group_index', None,),
             ('posts:group_list', (self.group.slug,)),
             ('posts:profile', (self.user.username,)),
             ('posts:post_detail', (self.post.pk,)),
@@ -116,6 +120,8 @@ class StaticURLTests(TestCase):
         # вызывается соответствующий HTML-шаблон
         templates_page_names = (
             ('posts:index', None, 'posts/index.html'),
+            ('posts:trending', None, 'posts/trending.html'),
+            ('posts:group_index', None, 'posts/groups.html'),
             ('posts:group_list', (self.group.slug,), 'posts/group_list.html'),
             ('posts:profile', (self.user.username,), 'posts/profile.html'),
             ('posts:post_detail', (self.post.pk,), 'posts/post_detail.html'),
@@ -132,6 +138,8 @@ class StaticURLTests(TestCase):
     def test_reverse_name_url(self):
         url_page_names = (
             ('posts:index', None, '/'),
+            ('posts:trending', None, '/trending/'),
+            ('posts:group_index', None, '/groups/'),
             ('posts:group_list', (self.group.slug,),
              f'/group/{self.group.slug}/'),
             ('posts:profile', (self.user.username,),
@@ -1,17 +1,32 @@
 import shutil
 import tempfile
 
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from http import HTTPStatus
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django import forms
 
-from posts.models import Post, Group, Follow
+from core.profiling import TemplateProfile
+from posts.models import Comment, Post, PostRank, Group, Follow
+from posts.archive import archive_posts
+from posts.authors import resolve_username
+from posts.events import get_hub, publish_post
+from posts.sharding import databases
+from posts.trending import HALF_LIFE, update_rankings
 from posts.forms import PostForm
 
 User = get_user_model()
@@ -19,8 +34,24 @@ User = get_user_model()
 PAG_CNT = 13
 
 
+@contextmanager
+def capture_queries():
+    """Запросы ко всем базам, включая шарды."""
+    captured = []
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections
+        ]
+        yield captured
+    captured += [
+        query for context in contexts for query in context.captured_queries]
+
+
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class PostPagesTests(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -169,6 +200,77 @@ class PostPagesTests(TestCase):
                             'form').fields.get(value)
                         self.assertIsInstance(form_field, expected)
 
+    def test_group_index_shows_stats(self):
+        """В каталоге групп число постов и дата последнего поста."""
+        response = self.authorized_author.get(reverse('posts:group_index'))
+        group = response.context['page_obj'][0]
+        self.assertEqual(group, self.group)
+        self.assertEqual(group.stats.posts_count, 1)
+        self.assertEqual(group.stats.last_post, self.post.pub_date)
+
+    def test_group_stats_follow_post_group_change(self):
+        """При переносе поста пересчитываются обе группы."""
+        new_group = Group.objects.create(
+            title='Новая группа',
+            slug='new-group',
+            description='Тестовое описание',
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = new_group
+        post.save()
+        self.group.stats.refresh_from_db()
+        self.assertEqual(self.group.stats.posts_count, 0)
+        self.assertEqual(new_group.stats.posts_count, 1)
+
+    def test_group_stats_counted_without_aggregates(self):
+        """Новый и удалённый пост меняют счётчик без пересчёта группы."""
+        with capture_queries() as queries:
+            post = Post.objects.create(
+                author=self.user, group=self.group, text='Новый пост')
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']])
+        self.group.stats.refresh_from_db()
+        self.assertEqual(self.group.stats.posts_count, 2)
+        self.assertEqual(self.group.stats.last_post, post.pub_date)
+        with capture_queries() as queries:
+            Post.objects.get(pk=self.post.pk).delete()
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']])
+        self.group.stats.refresh_from_db()
+        self.assertEqual(self.group.stats.posts_count, 1)
+        post.delete()
+        self.group.stats.refresh_from_db()
+        self.assertEqual(self.group.stats.posts_count, 0)
+        self.assertIsNone(self.group.stats.last_post)
+
+    def test_group_cache_invalidated_on_edit(self):
+        """После правки группы страница группы показывает новые данные."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.authorized_author.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.authorized_author.get(url)
+        self.assertEqual(response.context['group'].title, 'Новое название')
+
+    def test_archived_post_detail(self):
+        """Архивный пост открывается по старому адресу с комментариями."""
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        archived = archive_posts(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(archived, 1)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        response = self.authorized_author.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['archived'])
+        self.check_context(response=response, is_post=True)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий'])
+        self.assertNotContains(
+            response, reverse('posts:post_edit', args=(self.post.id,)))
+
     def test_cache_index_page(self):
         """Записи Index хранятся в кэше и обновлялся раз в 20 секунд"""
         Post.objects.all().delete()
@@ -185,8 +287,62 @@ class PostPagesTests(TestCase):
         response_3 = self.authorized_author.get(reverse('posts:index'))
         self.assertNotEqual(response_1.content, response_3.content)
 
+    def test_template_profile_counts_includes(self):
+        """Профилировщик считает рендеринг каждого include."""
+        with TemplateProfile() as profile:
+            self.authorized_author.get(
+                reverse('posts:group_list', args=(self.group.slug,)))
+        count, total = profile.stats['posts/includes/post_card.html']
+        self.assertEqual(count, 1)
+        self.assertGreater(total, 0)
+        self.assertIn('posts/group_list.html', profile.stats)
+
+
+class TrendingViewsTest(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='posts_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.quiet_post = Post.objects.create(
+            author=cls.user,
+            text='Пост без комментариев',
+        )
+        cls.discussed_post = Post.objects.create(
+            author=cls.user,
+            text='Обсуждаемый пост',
+            group=cls.group,
+        )
+        Comment.objects.create(
+            post=cls.discussed_post, author=cls.user, text='Комментарий')
+
+    def test_trending_ordered_by_engagement(self):
+        """Пост с комментариями выше в популярном, его группа в списке."""
+        update_rankings()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.discussed_post, self.quiet_post])
+        self.assertEqual(response.context['trending_groups'], [self.group])
+
+    def test_rankings_decay_incrementally(self):
+        """Без новых событий оценка падает вдвое за период полураспада."""
+        update_rankings()
+        rank = PostRank.objects.get(post=self.quiet_post)
+        update_rankings(now=rank.computed + HALF_LIFE)
+        rank_later = PostRank.objects.get(post=self.quiet_post)
+        self.assertAlmostEqual(rank_later.score, rank.score / 2)
+
 
 class PaginatorViewsTest(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -245,8 +401,28 @@ class PaginatorViewsTest(TestCase):
                             self.assertEqual(len(
                                 response.context['page_obj']), count)
 
+    def test_partitioned_pages_follow_pub_date_order(self):
+        """Страницы, собранные по месяцам, совпадают с обычной
+        сортировкой ленты."""
+        now = timezone.now()
+        for number, post in enumerate(self.post):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=number * 20))
+        cache.clear()
+        expected = list(Post.objects.values_list('pk', flat=True))
+        shown = []
+        for page in (1, 2):
+            response = self.client.get(
+                reverse('posts:index') + f'?page={page}')
+            shown += [post.pk for post in response.context['page_obj']]
+            self.assertEqual(
+                response.context['page_obj'].paginator.count, PAG_CNT)
+        self.assertEqual(shown, expected)
+
 
 class FollowViewsTest(TestCase):
+    databases = '__all__'
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -262,6 +438,7 @@ class FollowViewsTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         # Клиент подписчика
         self.follower_client = Client()
         self.follower_client.force_login(self.follower)
@@ -295,6 +472,50 @@ class FollowViewsTest(TestCase):
         Follow.objects.all().delete()
         self.assertEqual(Follow.objects.count(), follows_count - 1)
 
+    def test_profile_following_state_invalidated(self):
+        """Состояние подписки на профиле обновляется после подписки."""
+        url = reverse('fragment', args=('follow_button',)) + (
+            f'?author_id={self.author.pk}&username={self.author.username}')
+        response = self.follower_client.get(url)
+        self.assertFalse(response.context['following'])
+        self.follower_client.get(reverse('posts:profile_follow',
+                                 args=(self.author.username,)))
+        response = self.follower_client.get(url)
+        self.assertTrue(response.context['following'])
+        self.follower_client.get(reverse('posts:profile_unfollow',
+                                 args=(self.author.username,)))
+        response = self.follower_client.get(url)
+        self.assertFalse(response.context['following'])
+
+    def test_profile_summary_cached_and_invalidated(self):
+        """Шапка профиля не пересчитывается при листании и
+        обновляется после подписки."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.user_client.get(url)
+        with capture_queries() as queries:
+            response = self.user_client.get(url)
+        self.assertEqual(len(queries), 1, queries)
+        self.assertEqual(response.context['summary']['followers_count'], 0)
+        Follow.objects.create(user=self.follower, author=self.author)
+        response = self.user_client.get(url)
+        self.assertEqual(response.context['summary']['followers_count'], 1)
+
+    def test_follow_index_shows_recommendations(self):
+        """На странице подписок есть авторы, которых читают друзья."""
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.create(user=self.user, author=self.author)
+        call_command('recommend_follows', stdout=StringIO())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        authors = [
+            recommendation.author
+            for recommendation in response.context['recommendations']
+        ]
+        self.assertEqual(authors, [self.author])
+        self.follower_client.post(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertFalse(response.context['recommendations'])
+
     def test_post_include_in_following(self):
         Follow.objects.create(
             user=self.follower,
@@ -313,3 +534,225 @@ class FollowViewsTest(TestCase):
             )
         )
         self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_follow_feed_counts_invalidated(self):
+        """Старые посты нового автора сразу появляются в ленте подписок."""
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=timezone.now() - timedelta(days=40))
+        url = reverse('posts:follow_index')
+        response = self.follower_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 0)
+        self.follower_client.get(reverse(
+            'posts:profile_follow', args=(self.author.username,)))
+        response = self.follower_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        Follow.objects.filter(user=self.follower).delete()
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.get(user=self.follower).delete()
+        Follow.objects.create(user=self.follower, author=self.author)
+        response = self.follower_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+
+    def test_new_post_event_waits_for_its_database(self):
+        """Событие о посте уходит после фиксации базы, где он лежит."""
+        with mock.patch('posts.signals.transaction.on_commit') as on_commit:
+            post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(on_commit.call_args[1]['using'], post._state.db)
+
+    @override_settings(POST_EVENTS_HEARTBEAT=0)
+    def test_follow_events_count_new_posts(self):
+        """Поток подписок сообщает только о постах избранных авторов."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        hub = get_hub()
+        last_id = hub.last_id()
+        publish_post(Post(author=self.user, text='Чужой пост'))
+        publish_post(self.post)
+        publish_post(self.post)
+        response = self.follower_client.get(
+            reverse('posts:post_events') + '?feed=follow',
+            HTTP_LAST_EVENT_ID=str(last_id))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        event = next(response.streaming_content).decode()
+        self.assertIn(f'id: {last_id + 3}\n', event)
+        self.assertIn('data: {"count": 2}', event)
+        self.assertEqual(next(response.streaming_content), b': ping\n\n')
+        response = self.client.get(
+            reverse('posts:post_events') + '?feed=follow')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_follow_is_idempotent_and_ajax(self):
+        """Повторная подписка ничего не меняет, AJAX получает JSON."""
+        url = reverse('posts:profile_follow', args=(self.author.username,))
+        for _ in range(2):
+            response = self.follower_client.get(
+                url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(response.json(), {
+                'username': self.author.username, 'following': True})
+        self.assertEqual(Follow.objects.filter(
+            user=self.follower, author=self.author).count(), 1)
+        self.author_client.get(url)
+        self.assertFalse(Follow.objects.filter(user=self.author).exists())
+        url = reverse('posts:profile_unfollow', args=(self.author.username,))
+        for _ in range(2):
+            response = self.follower_client.get(url)
+            self.assertRedirects(response, reverse(
+                'posts:profile', args=(self.author.username,)))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_updates_cached_state(self):
+        url = reverse('fragment', args=('follow_button',)) + (
+            f'?author_id={self.author.pk}&username={self.author.username}')
+        self.follower_client.get(url)
+        self.follower_client.get(reverse(
+            'posts:profile_follow', args=(self.author.username,)))
+        self.assertTrue(self.follower_client.get(url).context['following'])
+        summary = self.follower_client.get(reverse(
+            'posts:profile', args=(self.author.username,))).context['summary']
+        self.assertEqual(summary['followers_count'], 1)
+
+    def test_bulk_follow(self):
+        url = reverse('posts:bulk_follow')
+        usernames = [self.author.username, self.user.username,
+                     self.follower.username, 'missing']
+        response = self.follower_client.post(url, {'username': usernames})
+        self.assertEqual(sorted(response.json()['changed']),
+                         sorted([self.author.username, self.user.username]))
+        response = self.follower_client.post(url, {'username': usernames})
+        self.assertEqual(response.json()['changed'], [])
+        response = self.follower_client.post(
+            url, {'username': usernames, 'action': 'unfollow'})
+        self.assertEqual(len(response.json()['changed']), 2)
+        self.assertFalse(Follow.objects.filter(user=self.follower).exists())
+
+    def test_username_lookup_ignores_case(self):
+        """Имя в другом регистре ведёт на канонический адрес профиля."""
+        url = reverse('posts:profile', args=('Posts_Author',))
+        response = self.client.get(url + '?page=2')
+        self.assertRedirects(
+            response,
+            reverse('posts:profile', args=(self.author.username,))
+            + '?page=2',
+            fetch_redirect_response=False)
+        resolve_username(self.author.username)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_username(self.author.username),
+                             (self.author.pk, self.author.username))
+        self.follower_client.get(reverse(
+            'posts:profile_follow', args=('POSTS_AUTHOR',)))
+        self.assertTrue(Follow.objects.filter(
+            user=self.follower, author=self.author).exists())
+
+    def test_warm_profile_skips_users_table(self):
+        """Профиль с тёплым кэшем не обращается к таблице пользователей;
+        удалённый автор сразу даёт 404."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.client.get(url)
+        with capture_queries() as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(
+            [query for query in queries if '"auth_user"' in query['sql']])
+        User.objects.get(pk=self.author.pk).delete()
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_username_cache_follows_renames(self):
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        twin = User.objects.create(username='Posts_Author')
+        response = self.client.get(
+            reverse('posts:profile', args=('Posts_Author',)))
+        self.assertEqual(response.context['author'], twin)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed'
+        author.save()
+        self.assertRedirects(
+            self.client.get(url),
+            reverse('posts:profile', args=('Posts_Author',)))
+        twin.delete()
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_cyrillic_username(self):
+        """Кириллическое имя в точном написании находится всегда."""
+        masha = User.objects.create(username='Маша')
+        url = reverse('posts:profile', args=('Маша',))
+        response = self.client.get(url)
+        self.assertEqual(response.context['author'], masha)
+        self.follower_client.get(reverse(
+            'posts:profile_follow', args=('Маша',)))
+        self.assertTrue(Follow.objects.filter(
+            user=self.follower, author=masha).exists())
+        response = self.follower_client.get(reverse(
+            'posts:profile_unfollow', args=('Маша',)))
+        self.assertRedirects(response, url)
+        self.assertFalse(Follow.objects.filter(author=masha).exists())
+
+
+class DeltaFeedTest(TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='posts_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='delta', description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}',
+                                group=cls.group)
+            for number in range(3)
+        ]
+
+    def delta(self, query='', **headers):
+        return self.client.get(
+            reverse('posts:feed_delta') + query, **headers)
+
+    def test_delta_returns_only_new_posts_and_changes(self):
+        """После водяного знака приходят новые посты, правки и удаления."""
+        first = self.delta().json()
+        self.assertEqual([post['text'] for post in first['posts']],
+                         ['Пост 0', 'Пост 1', 'Пост 2'])
+        query = (f'?since={first["since"]}'
+                 f'&changes={first["changes_cursor"]}')
+        empty = self.delta(query).json()
+        self.assertEqual((empty['posts'], empty['changes']), ([], []))
+
+        new = Post.objects.create(author=self.author, text='Новый')
+        edited = self.posts[0]
+        edited.text = 'Исправлен'
+        edited.save()
+        deleted_id = self.posts[1].pk
+        self.posts[1].delete()
+        delta = self.delta(query).json()
+        self.assertEqual([post['id'] for post in delta['posts']], [new.pk])
+        self.assertEqual(delta['changes'], [
+            {'id': edited.pk, 'action': 'updated',
+             'post': delta['changes'][0]['post']},
+            {'id': deleted_id, 'action': 'deleted'},
+        ])
+        self.assertEqual(delta['changes'][0]['post']['text'], 'Исправлен')
+
+    def test_moved_post_leaves_group_delta(self):
+        first = self.delta('?feed=group&group=delta').json()
+        other = Group.objects.create(title='Другая', slug='other')
+        post = Post.objects.get(pk=self.posts[2].pk)
+        post.group = other
+        post.save()
+        delta = self.delta(
+            f'?feed=group&group=delta&since={first["since"]}'
+            f'&changes={first["changes_cursor"]}').json()
+        self.assertEqual(delta['changes'], [
+            {'id': post.pk, 'action': 'deleted'}])
+
+    def test_unchanged_feed_not_modified(self):
+        query = '?changes=0'
+        etag = self.delta(query)['ETag']
+        with capture_queries() as queries:
+            response = self.delta(query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        # Последний пост и последняя запись журнала в каждой базе постов.
+        self.assertEqual(len(queries), 2 * len(databases()))
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.delta(query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,94 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from .models import Comment, Follow, GroupRank, Post, PostRank
+from .sharding import databases
+
+# Оценка события уменьшается вдвое за HALF_LIFE.
+HALF_LIFE = timedelta(hours=12)
+# При первом расчёте учитываются события за WINDOW.
+WINDOW = timedelta(days=7)
+# Статьи с меньшей оценкой выпадают из рейтинга.
+MIN_SCORE = 0.01
+POST_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+
+def decay(age):
+    return 0.5 ** (age / HALF_LIFE)
+
+
+def follower_weight(user_ids):
+    """Вес действия пользователя растёт с логарифмом числа подписчиков."""
+    counts = defaultdict(int)
+    for alias in databases():
+        for author_id, followers in Follow.objects.using(alias).filter(
+                author__in=user_ids).values_list('author').annotate(
+                Count('pk')).order_by():
+            counts[author_id] += followers
+    return {pk: 1 + math.log1p(counts[pk]) for pk in user_ids}
+
+
+def collect_scores(since, now):
+    """Вклад статей и комментариев, появившихся после since."""
+    posts = list(Post.objects.filter(
+        pub_date__gt=since, pub_date__lte=now,
+    ).values_list('pk', 'author_id', 'pub_date'))
+    comments = list(Comment.objects.filter(
+        created__gt=since, created__lte=now,
+    ).values_list('post_id', 'author_id', 'created'))
+    weights = follower_weight(
+        {author for _, author, _ in posts + comments})
+    scores = defaultdict(float)
+    for post_id, author_id, pub_date in posts:
+        scores[post_id] += (
+            POST_WEIGHT * weights[author_id] * decay(now - pub_date))
+    for post_id, author_id, created in comments:
+        scores[post_id] += (
+            COMMENT_WEIGHT * weights[author_id] * decay(now - created))
+    return scores
+
+
+@transaction.atomic
+def update_rankings(now=None):
+    """Пересчитывает рейтинги статей и групп инкрементально.
+
+    Накопленные оценки затухают на время с прошлого расчёта, к ним
+    добавляется вклад только новых статей и комментариев.
+    """
+    now = now or timezone.now()
+    last = PostRank.objects.aggregate(last=Max('computed'))['last']
+    if last is None:
+        last = now - WINDOW
+    else:
+        PostRank.objects.update(
+            score=F('score') * decay(now - last), computed=now)
+        PostRank.objects.filter(score__lt=MIN_SCORE).delete()
+
+    scores = collect_scores(last, now)
+    existing = PostRank.objects.in_bulk(list(scores))
+    for post_id, rank in existing.items():
+        rank.score += scores.pop(post_id)
+        rank.computed = now
+    PostRank.objects.bulk_update(existing.values(), ['score', 'computed'])
+    PostRank.objects.bulk_create(
+        PostRank(post_id=post_id, score=score, computed=now)
+        for post_id, score in scores.items()
+    )
+
+    totals = defaultdict(float)
+    for alias in databases():
+        for group_id, total in PostRank.objects.using(alias).filter(
+                post__group__isnull=False).values_list(
+                'post__group').annotate(Sum('score')).order_by():
+            totals[group_id] += total
+    GroupRank.objects.all().delete()
+    GroupRank.objects.bulk_create(
+        GroupRank(group_id=group_id, score=total)
+        for group_id, total in totals.items()
+    )
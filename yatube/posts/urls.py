@@ -6,6 +6,10 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
+    path('events/', views.post_events, name='post_events'),
+    path('delta/', views.feed_delta, name='feed_delta'),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('create/', views.post_create, name='post_create'),
     path('profile/<str:username>/', views.profile, name='profile'),
@@ -14,6 +18,7 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.bulk_follow, name='bulk_follow'),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'),
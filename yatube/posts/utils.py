@@ -1,8 +1,111 @@
+import hashlib
+from datetime import datetime
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import linebreaks
+
+PARTITIONS_VERSION_KEY = 'partitions:version'
+PARTITIONS_CACHE_KEY = 'partitions:{}:{}'
 
 
-def pagination(request, posts):
-    paginator = Paginator(posts, settings.COUNT_STR)
+def pagination(request, posts, count=None, partitioned=False):
+    paginator_class = Paginator
+    if partitioned:
+        from .sharding import ShardedPaginator, is_enabled
+        paginator_class = (
+            ShardedPaginator if is_enabled() else PartitionedPaginator)
+    paginator = paginator_class(posts, settings.COUNT_STR)
+    if count is not None:
+        # Число объектов уже известно, COUNT(*) не нужен.
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def render_text(text):
+    """Экранирует текст и размечает абзацы, как фильтр linebreaks."""
+    return linebreaks(text, autoescape=True)
+
+
+def month_start(moment):
+    moment = timezone.localtime(moment)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    year, number = divmod(month.month, 12)
+    return timezone.make_aware(
+        datetime(month.year + year, number + 1, 1))
+
+
+def invalidate_partitions():
+    """Сбрасывает кэш числа постов в прошлых месяцах."""
+    try:
+        cache.incr(PARTITIONS_VERSION_KEY)
+    except ValueError:
+        cache.set(PARTITIONS_VERSION_KEY, 1, None)
+
+
+class PartitionedPaginator(Paginator):
+    """Пагинатор постов по месячным окнам pub_date.
+
+    Страница собирается только из окон, которые она покрывает, начиная
+    с самого нового, так что первые страницы ленты читают свежие посты
+    по индексу pub_date, не сортируя всю таблицу. Число постов в прошлых
+    месяцах меняется редко и хранится в кэше, текущий месяц считается
+    при каждом запросе.
+    """
+
+    @cached_property
+    def windows(self):
+        current = month_start(timezone.now())
+        live = self.object_list.filter(pub_date__gte=current).count()
+        query = f'{self.object_list.query}:{current.isoformat()}'
+        key = PARTITIONS_CACHE_KEY.format(
+            cache.get(PARTITIONS_VERSION_KEY, 0),
+            hashlib.md5(query.encode()).hexdigest(),
+        )
+        past = cache.get(key)
+        if past is None:
+            past = list(
+                self.object_list.filter(pub_date__lt=current)
+                .annotate(month=TruncMonth('pub_date'))
+                .values_list('month').annotate(count=Count('pk'))
+                .order_by('-month')
+            )
+            cache.set(key, past, settings.PARTITION_COUNTS_TIMEOUT)
+        return [(current, None, live)] + [
+            (month, next_month(month), count) for month, count in past
+        ]
+
+    @cached_property
+    def count(self):
+        return sum(count for _, _, count in self.windows)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        offset = (number - 1) * self.per_page
+        size = self.per_page
+        if offset + size + self.orphans >= self.count:
+            size = self.count - offset
+        objects = []
+        skipped = 0
+        for start, end, count in self.windows:
+            if len(objects) >= size:
+                break
+            if skipped + count <= offset or not count:
+                skipped += count
+                continue
+            window = self.object_list.filter(pub_date__gte=start)
+            if end is not None:
+                window = window.filter(pub_date__lt=end)
+            local = max(offset - skipped, 0)
+            objects += window[local:local + size - len(objects)]
+            skipped += count
+        return self._get_page(objects, number, self)
@@ -1,55 +1,163 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_POST
 
+from core.caching import cache_policy
+from core.ratelimit import ratelimit
+
+from .authors import get_author_summary, resolve_username
+from .delta import feed_state, get_delta, get_feed, make_etag
+from .events import stream
+from .follows import follow, get_following_ids, unfollow
+from .groups import get_group_or_404
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .archive import unpack_comments
+from .models import (
+    ArchivedPost, Group, GroupRank, Post, User, Recommendation
+)
+from .sharding import post_db
 from .utils import pagination
 
 
+@cache_policy(shared=True)
 def index(request):
     posts = Post.objects.select_related('author', 'group')
     context = {
-        'page_obj': pagination(request, posts),
+        'page_obj': pagination(request, posts, partitioned=True),
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_policy(shared=True)
+def trending(request):
+    posts = Post.objects.filter(
+        rank__isnull=False
+    ).select_related('author', 'group', 'rank').order_by('-rank__score')
+    groups = GroupRank.objects.select_related(
+        'group')[:settings.TRENDING_GROUPS_COUNT]
+    context = {
+        'page_obj': pagination(request, posts),
+        'trending_groups': [rank.group for rank in groups],
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def post_events(request):
+    """Поток SSE с числом новых постов в ленте, группе или подписках."""
+    feed = request.GET.get('feed')
+    if feed == 'group':
+        group = get_group_or_404(request.GET.get('group', ''))
+        channels = {f'group:{group.pk}'}
+    elif feed == 'follow':
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        channels = {
+            f'author:{pk}' for pk in get_following_ids(request.user)}
+    else:
+        channels = {'feed'}
+    last_id = request.META.get('HTTP_LAST_EVENT_ID', '')
+    response = StreamingHttpResponse(
+        stream(frozenset(channels),
+               int(last_id) if last_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def feed_delta(request):
+    """Новые посты и изменения ленты после водяного знака клиента.
+
+    Пока в ленте ничего не произошло, на запрос с If-None-Match
+    отвечает 304 после двух запросов по индексу на базу постов.
+    """
+    posts, changes = get_feed(request)
+    etag = make_etag(request, feed_state(posts, changes))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(get_delta(request, posts, changes))
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@cache_policy(shared=True)
+def group_index(request):
+    groups = Group.objects.select_related('stats').order_by('title')
+    context = {
+        'page_obj': pagination(request, groups),
+    }
+    return render(request, 'posts/groups.html', context)
+
+
+@cache_policy(shared=True)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = get_group_or_404(slug)
     posts = group.posts.select_related('author').all()
     context = {
         'group': group,
-        'page_obj': pagination(request, posts),
+        'page_obj': pagination(request, posts, partitioned=True),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_policy(shared=True)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author_id, canonical = resolve_username(username)
+    if canonical != username:
+        url = reverse('posts:profile', args=(canonical,))
+        if request.GET:
+            url = f'{url}?{request.GET.urlencode()}'
+        return redirect(url)
+    summary = get_author_summary(author_id)
+    # Автор из кэша: постам хватает его id и имени, запрос не нужен.
+    author = User(pk=author_id, username=summary['username'])
     posts = author.posts.select_related('group')
-    following = request.user.is_authenticated and author.following.filter(
-        user=request.user).exists()
     context = {
         'author': author,
-        'page_obj': pagination(request, posts),
-        'following': following,
+        'summary': summary,
+        'page_obj': pagination(request, posts, summary['posts_count']),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_policy(shared=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(
-        Post.objects.prefetch_related(
-            'comments__author'), id=post_id)
+    post = Post.objects.using(post_db(post_id)).select_related(
+        'author', 'group'
+    ).prefetch_related('comments__author').filter(id=post_id).first()
+    if post is None:
+        return archived_post_detail(request, post_id)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
+        'summary': get_author_summary(post.author_id),
         'form': form,
         'comments': post.comments.all(),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def archived_post_detail(request, post_id):
+    post = get_object_or_404(
+        ArchivedPost.objects.select_related('author', 'group'), id=post_id)
+    context = {
+        'post': post,
+        'summary': get_author_summary(post.author_id),
+        'comments': unpack_comments(post.comments_data),
+        'archived': True,
+    }
+    return render(request, 'posts/post_detail.html', context)
+
+
+@cache_policy()
+@ratelimit('post_create')
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -65,27 +173,39 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@cache_policy()
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.using(post_db(post_id)), id=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail',
                         post_id=post_id)
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
                     instance=post)
+    status = 200
     if form.is_valid():
-        form.save()
-        return redirect('posts:post_detail', post_id=post_id)
+        try:
+            version = int(request.POST.get('version', post.version))
+        except ValueError:
+            version = post.version
+        if post.save_changes(form.changed_data, version):
+            return redirect('posts:post_detail', post_id=post_id)
+        form.add_error(None, 'Пост изменили, пока вы его редактировали. '
+                             'Проверьте текст и сохраните ещё раз.')
+        post.version = Post.objects.using(post_db(post_id)).values_list(
+            'version', flat=True).get(id=post_id)
+        status = 409
     context = {
         'form': form,
     }
-    return render(request, 'posts/create_post.html', context)
+    return render(request, 'posts/create_post.html', context, status=status)
 
 
+@ratelimit('add_comment')
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.using(post_db(post_id)), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -95,34 +215,63 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+@cache_policy()
 @login_required
 def follow_index(request):
     posts = Post.objects.filter(
         author__following__user=request.user
     ).select_related('author', 'group')
+    recommendations = Recommendation.objects.filter(
+        user=request.user
+    ).exclude(
+        author_id__in=get_following_ids(request.user)
+    ).select_related('author')[:settings.RECOMMENDATIONS_COUNT]
     context = {
-        'page_obj': pagination(request, posts),
+        'page_obj': pagination(request, posts, partitioned=True),
+        'recommendations': recommendations,
     }
     return render(
         request, 'posts/follow.html', context)
 
 
+def follow_response(request, username, following):
+    """JSON для AJAX-кнопки, иначе возврат на профиль."""
+    if request.is_ajax():
+        return JsonResponse({'username': username, 'following': following})
+    return redirect('posts:profile', username=username)
+
+
+@ratelimit('profile_follow', methods=('GET', 'POST'))
 @login_required
 def profile_follow(request, username):
-    follow_user = get_object_or_404(User, username=username)
-    if request.user != follow_user:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=follow_user
-        )
-    return redirect('posts:profile', username=username)
+    author_id, username = resolve_username(username)
+    follow(request.user, [author_id])
+    return follow_response(
+        request, username, author_id != request.user.pk)
 
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(
-        Follow,
-        user=request.user,
-        author__username=username,
-    ).delete()
-    return redirect('posts:profile', username=username)
+    author_id, username = resolve_username(username)
+    if author_id == request.user.pk:
+        raise Http404
+    unfollow(request.user, [author_id])
+    return follow_response(request, username, False)
+
+
+@ratelimit('bulk_follow', methods=('POST',))
+@login_required
+@require_POST
+def bulk_follow(request):
+    """Подписка или отписка по списку имён, например из контактов."""
+    usernames = request.POST.getlist('username')[:settings.BULK_FOLLOW_LIMIT]
+    author_ids = User.objects.filter(
+        username__in=usernames).values_list('pk', flat=True)
+    if request.POST.get('action') == 'unfollow':
+        changed = unfollow(request.user, author_ids)
+    else:
+        changed = follow(request.user, author_ids)
+    return JsonResponse({
+        'changed': list(User.objects.filter(
+            pk__in=changed).values_list('username', flat=True)),
+    })
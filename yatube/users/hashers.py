@@ -0,0 +1,47 @@
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id с параметрами OWASP: 19 МиБ памяти, два прохода.
+
+    Django 2.2 считает argon2i; такие хеши проверяются и пересчитываются
+    в argon2id при входе.
+    """
+
+    time_cost = 2
+    memory_cost = 19 * 1024
+    parallelism = 1
+
+    def encode(self, password, salt):
+        argon2 = self._load_library()
+        data = argon2.low_level.hash_secret(
+            password.encode(),
+            salt.encode(),
+            time_cost=self.time_cost,
+            memory_cost=self.memory_cost,
+            parallelism=self.parallelism,
+            hash_len=argon2.DEFAULT_HASH_LENGTH,
+            type=argon2.low_level.Type.ID,
+        )
+        return self.algorithm + data.decode('ascii')
+
+    def verify(self, password, encoded):
+        argon2 = self._load_library()
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        variety = rest.split('$', 1)[0]
+        kind = (argon2.low_level.Type.ID if variety == 'argon2id'
+                else argon2.low_level.Type.I)
+        try:
+            return argon2.low_level.verify_secret(
+                ('$' + rest).encode('ascii'), password.encode(), type=kind)
+        except argon2.exceptions.VerificationError:
+            return False
+
+    def must_update(self, encoded):
+        variety = self._decode(encoded)[1]
+        return variety != 'argon2id' or super().must_update(encoded)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    rounds = 10
@@ -0,0 +1,27 @@
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Измеряет число проверок пароля в секунду на одно ядро.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        password = 'correct horse battery staple'
+        iterations = options['iterations']
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as error:
+                self.stdout.write(f'{hasher.algorithm}: {error}')
+                continue
+            start = time.perf_counter()
+            for _ in range(iterations):
+                hasher.verify(password, encoded)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{hasher.algorithm}: {iterations / elapsed:.1f} входов/с')
@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+User = get_user_model()
+
+
+class PasswordHashingTests(TestCase):
+    databases = '__all__'
+
+    def test_authenticate(self):
+        """Вход проходит только с верным паролем."""
+        user = User.objects.create_user(username='NoName', password='pass')
+        self.assertEqual(
+            authenticate(username='NoName', password='pass'), user)
+        self.assertIsNone(authenticate(username='NoName', password='bad'))
+        self.assertIsNone(authenticate(username='nobody', password='pass'))
+
+    def test_rehash_on_login(self):
+        """Хеш устаревшего алгоритма пересчитывается при входе."""
+        user = User.objects.create(
+            username='NoName',
+            password=make_password('pass', hasher='pbkdf2_sha1'),
+        )
+        authenticate(username='NoName', password='pass')
+        user.refresh_from_db()
+        self.assertTrue(
+            user.password.startswith(get_hasher().algorithm + '$'))
+        self.assertTrue(user.check_password('pass'))
+
+    @override_settings(
+        PASSWORD_HASHERS=['users.hashers.Argon2PasswordHasher'])
+    def test_argon2i_rehashed_to_argon2id(self):
+        """Хеш argon2i из Django пересчитывается в argon2id."""
+        try:
+            legacy = hashers.Argon2PasswordHasher()
+            encoded = legacy.encode('pass', legacy.salt())
+        except ValueError:
+            self.skipTest('argon2-cffi не установлен')
+        user = User.objects.create(username='NoName', password=encoded)
+        self.assertEqual(
+            authenticate(username='NoName', password='pass'), user)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertTrue(user.check_password('pass'))
+        self.assertFalse(user.check_password('bad'))
+
+    def test_bench_login(self):
+        """Бенчмарк печатает скорость для каждого хешера."""
+        out = StringIO()
+        call_command('bench_login', iterations=1, stdout=out)
+        self.assertIn(get_hasher().algorithm, out.getvalue())
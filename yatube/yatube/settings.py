@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -42,12 +43,29 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# В боевом режиме шаблоны компилируются один раз и хранятся в памяти.
+TEMPLATE_CACHE = not DEBUG or os.getenv('TEMPLATE_CACHE') == '1'
+
+# Замер времени рендеринга шаблонов и include, см. core.profiling.
+TEMPLATE_PROFILING = os.getenv('TEMPLATE_PROFILING') == '1'
+
+if TEMPLATE_PROFILING:
+    MIDDLEWARE.insert(0, 'core.profiling.TemplateProfilerMiddleware')
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': (
+                [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+                if TEMPLATE_CACHE else TEMPLATE_LOADERS
+            ),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -69,6 +87,43 @@ DATABASES = {
     }
 }
 
+# Число SQLite-шардов для постов, комментариев и подписок, разложенных
+# по id автора (0 — всё хранится в default).
+POST_SHARDS = int(os.getenv('POST_SHARDS', 0))
+
+SHARD_ALIASES = [f'shard_{number}' for number in range(POST_SHARDS)]
+
+for alias in SHARD_ALIASES:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'{alias}.sqlite3'),
+    }
+
+DATABASE_ROUTERS = (
+    ['posts.sharding.AuthorShardRouter'] if SHARD_ALIASES else []
+)
+
+
+# argon2 или bcrypt, если библиотека установлена, иначе PBKDF2. Хеши
+# остальных алгоритмов проверяются и пересчитываются при входе.
+PASSWORD_HASH_POLICY = os.getenv('PASSWORD_HASH_POLICY', 'argon2')
+
+PREFERRED_HASHERS = {
+    'argon2': ('argon2', 'users.hashers.Argon2PasswordHasher'),
+    'bcrypt': ('bcrypt', 'users.hashers.BCryptSHA256PasswordHasher'),
+}
+
+PASSWORD_HASHERS = [
+    hasher
+    for library, hasher in sorted(
+        PREFERRED_HASHERS.values(),
+        key=lambda item: item[0] != PASSWORD_HASH_POLICY,
+    )
+    if find_spec(library)
+] + [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,8 +156,70 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+# Хэши в именах файлов и сжатые копии, собираются через collectstatic.
+STATIC_MANIFEST = os.getenv('STATIC_MANIFEST') == '1'
+
+if STATIC_MANIFEST:
+    STATICFILES_STORAGE = (
+        'core.staticfiles.CompressedManifestStaticFilesStorage'
+    )
+
+# Раздача STATIC_ROOT самим приложением, для контейнеров без nginx.
+STATIC_SERVE = os.getenv('STATIC_SERVE') == '1'
+
+if STATIC_SERVE:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'core.staticfiles.StaticFilesMiddleware',
+    )
+
+# Сколько секунд страницы для анонимов хранятся в браузере и в общем
+# кэше (reverse proxy, CDN), см. core.caching.
+PAGE_MAX_AGE = int(os.getenv('PAGE_MAX_AGE', 60))
+PAGE_SHARED_MAX_AGE = int(os.getenv('PAGE_SHARED_MAX_AGE', 300))
+
+# Как заполняются персональные части страниц (см. core.fragments):
+# fetch — скриптом в браузере, esi — прокси по <esi:include>.
+FRAGMENTS_MODE = os.getenv('FRAGMENTS_MODE', 'fetch')
+
+# Хаб событий о новых постах для потока /events/ (см. posts.events)
+# и интервал пустых сообщений, держащих соединение открытым.
+POST_EVENTS_BACKEND = 'posts.events.LocalBackend'
+POST_EVENTS_HEARTBEAT = 15
+
 COUNT_STR: int = 10
 
+# Сколько новых постов и изменений отдаёт /delta/ за один запрос.
+DELTA_LIMIT: int = 100
+
+# Сколько секунд читатель журнала ждёт событие перед дырой в id:
+# транзакция с меньшим id ещё может зафиксироваться.
+CHANGELOG_SETTLE: int = 5
+
+# Сколько секунд хранится число постов в прошлых месяцах.
+PARTITION_COUNTS_TIMEOUT: int = 60 * 10
+
+RECOMMENDATIONS_COUNT: int = 5
+
+# Сколько имён принимает /follow/bulk/ за один запрос.
+BULK_FOLLOW_LIMIT: int = 500
+
+TRENDING_GROUPS_COUNT: int = 10
+
+MODERATION_BATCH_SIZE: int = 500
+
+# Без статистики планировщика список в админке считает строки
+# не дальше этого числа.
+ADMIN_COUNT_LIMIT: int = 10000
+
+# Посты старше этого срока переносятся в архив командой archive_posts.
+ARCHIVE_AFTER_DAYS: int = 365
+
+# Массовые действия над большим числом строк выполняются в фоне.
+MODERATION_BACKGROUND_THRESHOLD: int = 2000
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -117,6 +234,44 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# local - файлы в MEDIA_ROOT, object - S3-совместимое хранилище.
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'local')
+
+if MEDIA_STORAGE == 'object':
+    DEFAULT_FILE_STORAGE = 'core.storage.ObjectStorage'
+
+OBJECT_STORAGE = {
+    'CLIENT': os.getenv(
+        'OBJECT_STORAGE_CLIENT', 'core.storage.LocalObjectStore'),
+    'OPTIONS': {
+        'root': os.path.join(BASE_DIR, 'object_store'),
+        'bucket': 'yatube-media',
+    },
+    'MULTIPART_THRESHOLD': 8 * 1024 * 1024,
+    'PART_SIZE': 8 * 1024 * 1024,
+    'WORKERS': 4,
+    'URL_EXPIRES': 60 * 60,
+}
+
+# db, cached_db или signed_cookies; неизменённые сессии не перезаписываются.
+SESSION_MODE = os.getenv('SESSION_MODE', 'db')
+
+SESSION_ENGINE = f'core.sessions.{SESSION_MODE}'
+
+RATELIMIT_ENABLED = True
+
+RATELIMIT_STORE = 'core.ratelimit.CacheCounterStore'
+
+RATELIMIT_CACHE = 'default'
+
+RATELIMITS = {
+    'post_create': '10/m',
+    'add_comment': '20/m',
+    'profile_follow': '30/m',
+    'bulk_follow': '5/m',
+    'signup': '5/m',
+}
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',